@@ -0,0 +1,60 @@
+"""
+Duplicate-check latency on `favorite` with and without the unique indexes.
+
+Fills an SQLite table shaped like `favorite` with N rows, then times the
+`user_id = ? AND planet_id = ?` lookup every add-favorite used to run, first
+as a full scan and then through ix_favorite_user_planet. Needs only the
+standard library.
+
+    python benchmarks/bench_favorite_index.py             # 2,000,000 favorites
+    python benchmarks/bench_favorite_index.py 5000000
+"""
+import sys
+import time
+import random
+import sqlite3
+
+USERS = 50000
+PLANETS = 1000
+LOOKUPS = 200
+
+
+def fill(conn, rows):
+    conn.execute("CREATE TABLE favorite (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+                 "people_id INTEGER, planet_id INTEGER)")
+    rng = random.Random(42)
+    conn.executemany(
+        "INSERT INTO favorite (user_id, planet_id) VALUES (?, ?)",
+        ((rng.randrange(USERS), rng.randrange(PLANETS)) for _ in range(rows)))
+    conn.commit()
+
+
+def time_lookups(conn, pairs):
+    start = time.perf_counter()
+    for user_id, planet_id in pairs:
+        conn.execute("SELECT id FROM favorite WHERE user_id = ? AND planet_id = ?",
+                     (user_id, planet_id)).fetchone()
+    return (time.perf_counter() - start) / len(pairs)
+
+
+def main(rows):
+    conn = sqlite3.connect(':memory:')
+    print("filling {:,} favorites...".format(rows))
+    fill(conn, rows)
+    rng = random.Random(7)
+    pairs = [(rng.randrange(USERS), rng.randrange(PLANETS)) for _ in range(LOOKUPS)]
+
+    scan = time_lookups(conn, pairs[:20])
+    # The random fill contains duplicates, as the old race could produce
+    conn.execute("DELETE FROM favorite WHERE id NOT IN "
+                 "(SELECT MIN(id) FROM favorite GROUP BY user_id, planet_id)")
+    conn.execute("CREATE UNIQUE INDEX ix_favorite_user_planet ON favorite (user_id, planet_id)")
+    indexed = time_lookups(conn, pairs)
+
+    print("full scan : {:10.3f} ms/lookup".format(scan * 1e3))
+    print("unique idx: {:10.3f} ms/lookup".format(indexed * 1e3))
+    print("speedup   : {:10.0f}x".format(scan / indexed))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000000)
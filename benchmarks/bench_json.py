@@ -0,0 +1,72 @@
+"""
+Encoding throughput of the JSON encoders json_provider.py can pick.
+
+Builds list payloads shaped like /api/people, /api/planets and
+/api/users/favorites and times one full encode of each. `stdlib` uses the
+same settings as Flask's default provider (sorted keys, ASCII escapes).
+
+    python benchmarks/bench_json.py               # 1k, 100k and 1M rows
+    python benchmarks/bench_json.py 1000 50000    # custom sizes
+"""
+import sys
+import json
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def people(n):
+    return [{"id": i, "name": "Person {}".format(i), "birth_year": "{}BBY".format(i % 900),
+             "gender": ("male", "female", "n/a")[i % 3]} for i in range(1, n + 1)]
+
+
+def planets(n):
+    return [{"id": i, "name": "Planet {}".format(i), "climate": ("arid", "temperate", "frozen")[i % 3],
+             "terrain": "desert, mountains"} for i in range(1, n + 1)]
+
+
+def favorites(n):
+    return [{"id": i, "user_id": 1 + i % 1000, "people_id": i if i % 2 else None,
+             "planet_id": None if i % 2 else i} for i in range(1, n + 1)]
+
+
+def encoders():
+    yield 'stdlib', lambda obj: json.dumps(obj, sort_keys=True).encode('utf-8')
+    if orjson is not None:
+        yield 'orjson', orjson.dumps
+    if msgspec is not None:
+        yield 'msgspec', msgspec.json.Encoder().encode
+
+
+def best_of(fn, payload, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(payload)
+        best = min(best, time.perf_counter() - start)
+    return best, len(body)
+
+
+def main(sizes):
+    print("{:<10} {:>9} {:<8} {:>10} {:>12} {:>9}".format(
+        "payload", "rows", "encoder", "seconds", "rows/s", "MB/s"))
+    for size in sizes:
+        repeat = 5 if size <= 100000 else 2
+        for label, build in (("people", people), ("planets", planets), ("favorites", favorites)):
+            payload = build(size)
+            for name, encode in encoders():
+                seconds, length = best_of(encode, payload, repeat)
+                print("{:<10} {:>9} {:<8} {:>10.4f} {:>12,.0f} {:>9.1f}".format(
+                    label, size, name, seconds, size / seconds, length / seconds / 1e6))
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [1000, 100000, 1000000])
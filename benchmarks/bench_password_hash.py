@@ -0,0 +1,59 @@
+"""
+Login throughput per core for the password hash settings.
+
+Times the hashlib calls Werkzeug makes for each PASSWORD_HASH_METHOD
+candidate: one thread gives logins/s per core, and a pool as large as the
+CPU count shows how far the hashing pool in passwords.py scales, since
+hashlib releases the GIL. Standard library only.
+
+    python benchmarks/bench_password_hash.py
+    python benchmarks/bench_password_hash.py scrypt:65536:8:1 pbkdf2:sha256:1000000
+"""
+import os
+import sys
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_METHODS = ['scrypt:16384:8:1', 'scrypt:32768:8:1', 'pbkdf2:sha256:260000', 'pbkdf2:sha256:600000']
+SALT = b'0123456789abcdef'
+PASSWORD = b'correct horse battery staple'
+
+
+def hasher(method):
+    name, *params = method.split(':')
+    if name == 'scrypt':
+        n, r, p = (int(v) for v in params)
+        return lambda: hashlib.scrypt(PASSWORD, salt=SALT, n=n, r=r, p=p, maxmem=132 * n * r * p, dklen=64)
+    digest, iterations = params[0], int(params[1])
+    return lambda: hashlib.pbkdf2_hmac(digest, PASSWORD, SALT, iterations)
+
+
+def throughput(fn, threads, seconds=3.0):
+    deadline = time.perf_counter() + seconds
+
+    def loop():
+        done = 0
+        while time.perf_counter() < deadline:
+            fn()
+            done += 1
+        return done
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        total = sum(pool.map(lambda _: loop(), range(threads)))
+    return total / (time.perf_counter() - start)
+
+
+def main(methods):
+    cpus = os.cpu_count() or 1
+    print("{:<24} {:>12} {:>16} {:>10}".format("method", "ms/login", "logins/s/core", "x{} thr".format(cpus)))
+    for method in methods:
+        fn = hasher(method)
+        single = throughput(fn, 1)
+        pooled = throughput(fn, cpus)
+        print("{:<24} {:>12.1f} {:>16.1f} {:>10.1f}".format(method, 1000 / single, single, pooled))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or DEFAULT_METHODS)
@@ -0,0 +1,79 @@
+"""
+Memory and lookup cost of the revoked token filter.
+
+For each count of revoked JTIs, builds the Bloom filter revocation.py keeps
+in every worker and, for comparison, a plain Python set of the same JTIs
+(what an exact in-process blocklist would hold). Prints their memory, the
+per-lookup latency for valid tokens (misses) and revoked ones (hits), and
+the false positive rate measured on fresh JTIs: the share of valid tokens
+that still need a confirming query. Standard library only.
+
+    python benchmarks/bench_revocation.py
+    python benchmarks/bench_revocation.py 1000000 5000000 --error-rate 0.0001
+"""
+import os
+import sys
+import time
+import uuid
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from bloom import BloomFilter  # noqa: E402
+
+PROBES = 200000
+
+
+def per_lookup_us(container, items):
+    start = time.perf_counter()
+    for item in items:
+        item in container
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def run(count, error_rate):
+    revoked = [str(uuid.uuid4()) for _ in range(count)]
+    valid = [str(uuid.uuid4()) for _ in range(PROBES)]
+
+    bloom = BloomFilter(count, error_rate)
+    start = time.perf_counter()
+    for jti in revoked:
+        bloom.add(jti)
+    build = time.perf_counter() - start
+
+    tracemalloc.start()
+    exact = set(revoked)
+    # The set holds references; count the strings too, as a real set would own them
+    set_bytes = tracemalloc.get_traced_memory()[0] + sum(sys.getsizeof(j) for j in revoked)
+    tracemalloc.stop()
+
+    hits = revoked[:PROBES]
+    false_positives = sum(1 for jti in valid if jti in bloom)
+    return {
+        "count": count,
+        "bloom_mb": len(bloom.bits) / 2 ** 20,
+        "set_mb": set_bytes / 2 ** 20,
+        "build_s": build,
+        "bloom_miss_us": per_lookup_us(bloom, valid),
+        "bloom_hit_us": per_lookup_us(bloom, hits),
+        "set_us": per_lookup_us(exact, valid),
+        "fp_rate": false_positives / len(valid),
+        "hashes": bloom.hashes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('counts', nargs='*', type=int, default=[1000000, 2000000])
+    parser.add_argument('--error-rate', type=float, default=0.001)
+    args = parser.parse_args()
+    print("{:>10} {:>4} {:>10} {:>10} {:>9} {:>13} {:>12} {:>10} {:>9}".format(
+        "jtis", "k", "bloom MB", "set MB", "build s", "miss us/op", "hit us/op", "set us/op", "fp rate"))
+    for count in args.counts:
+        r = run(count, args.error_rate)
+        print("{count:>10} {hashes:>4} {bloom_mb:>10.2f} {set_mb:>10.1f} {build_s:>9.1f} {bloom_miss_us:>13.2f} "
+              "{bloom_hit_us:>12.2f} {set_us:>10.3f} {fp_rate:>9.5f}".format(**r))
+
+
+if __name__ == '__main__':
+    main()
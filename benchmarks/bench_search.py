@@ -0,0 +1,62 @@
+"""
+Query latency and memory of the in-process search index.
+
+Fills the InvertedIndex used by search.py on SQLite with synthetic planets
+(name, climate, terrain) and times typical queries: a full word, a short
+prefix, and two words. On Postgres the same queries run on GIN indexes;
+time those with EXPLAIN ANALYZE against a real catalogue. Standard library
+only.
+
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py 100000 1000000
+"""
+import os
+import sys
+import time
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from inverted_index import InvertedIndex, tokenize  # noqa: E402
+
+SYLLABLES = ['ta', 'too', 'ine', 'al', 'de', 'ran', 'ho', 'th', 'kas', 'hyy', 'yk', 'end', 'or', 'co', 'rus', 'cant']
+CLIMATES = ['arid', 'temperate', 'tropical', 'frozen', 'murky', 'windy', 'hot', 'humid']
+TERRAINS = ['desert', 'grasslands', 'mountains', 'jungle', 'forests', 'tundra', 'ice caves', 'swamp', 'ocean']
+QUERIES = ['tatoo', 'ka', 'ran arid', 'hoth frozen', 'co des']
+REPEAT = 200
+
+
+def name(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) + ' ' + str(rng.randint(1, 999))
+
+
+def build(count):
+    rng = random.Random(42)
+    index = InvertedIndex()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for doc_id in range(1, count + 1):
+        index.add(doc_id, [(name(rng), 1.0), (rng.choice(CLIMATES), 0.4), (rng.choice(TERRAINS), 0.4)])
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return index, elapsed, memory
+
+
+def main(counts):
+    print("{:>9} {:>9} {:>9}  {}".format("rows", "build s", "MB", "  ".join("{:>12}".format(q) for q in QUERIES)))
+    for count in counts:
+        index, elapsed, memory = build(count)
+        timings = []
+        for query in QUERIES:
+            words = tokenize(query)
+            start = time.perf_counter()
+            for _ in range(REPEAT):
+                index.search(words, 20)
+            timings.append((time.perf_counter() - start) / REPEAT * 1000)
+        print("{:>9} {:>9.1f} {:>9.1f}  {}".format(
+            count, elapsed, memory / 2 ** 20, "  ".join("{:>9.2f} ms".format(t) for t in timings)))
+
+
+if __name__ == '__main__':
+    main([int(c) for c in sys.argv[1:]] or [10000, 100000])
@@ -0,0 +1,58 @@
+"""
+Cold-start cost of building the app with different APP_FEATURES.
+
+Runs `python -X importtime -c "import wsgi"` in a fresh interpreter per
+configuration (from src/, like gunicorn) and reports the cumulative import
+time of `wsgi`, which builds the app, plus the slowest modules it imports
+directly.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py "api,swagger,admin,cors,migrate" "api,cors" "migrate"
+"""
+import os
+import sys
+import subprocess
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src')
+RUNS = 5
+
+
+def profile(features):
+    env = dict(os.environ, APP_FEATURES=features)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import wsgi'],
+                            cwd=SRC, env=env, capture_output=True, text=True, check=True)
+    packages = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        # Children are printed before their parent: keep only the ones
+        # listed right before `wsgi` itself
+        if depth == 0:
+            if name == 'wsgi':
+                total = int(cumulative)
+                break
+            packages = {}
+        elif depth == 1:
+            packages[name] = int(cumulative)
+    return total, packages
+
+
+def main(configs):
+    for features in configs:
+        totals, slowest = [], {}
+        for _ in range(RUNS):
+            total, packages = profile(features)
+            totals.append(total)
+            slowest = packages
+        print("APP_FEATURES={!r:<32} build app: {:7.1f} ms (best of {})".format(
+            features, min(totals) / 1000, RUNS))
+        for name, micros in sorted(slowest.items(), key=lambda kv: -kv[1])[:8]:
+            print("    {:<30} {:7.1f} ms".format(name, micros / 1000))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or ['api,swagger,admin,cors,migrate', 'api,cors'])
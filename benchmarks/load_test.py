@@ -0,0 +1,65 @@
+"""
+Minimal HTTP/1.1 load generator for comparing the sync and async servers.
+
+Opens `--concurrency` keep-alive connections and has each one issue GETs
+back to back for `--duration` seconds, then reports requests/s and latency
+percentiles. Standard library only, so it runs anywhere the API does.
+
+    python benchmarks/load_test.py http://127.0.0.1:3000/api/people?limit=50 -c 256 -d 30
+"""
+import time
+import asyncio
+import argparse
+from urllib.parse import urlsplit
+
+
+async def worker(host, port, target, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    request = "GET {} HTTP/1.1\r\nHost: {}\r\nConnection: keep-alive\r\n\r\n".format(target, host).encode()
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(request)
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if not status_line.startswith(b"HTTP/1.1 2"):
+                errors.append(status_line)
+    finally:
+        writer.close()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def main(url, concurrency, duration):
+    parts = urlsplit(url)
+    target = parts.path + ("?" + parts.query if parts.query else "")
+    deadline = time.perf_counter() + duration
+    latencies, errors = [], []
+    await asyncio.gather(*[
+        worker(parts.hostname, parts.port or 80, target, deadline, latencies, errors)
+        for _ in range(concurrency)])
+    latencies.sort()
+    print("requests   : {:,}  (errors: {})".format(len(latencies), len(errors)))
+    print("throughput : {:,.0f} req/s".format(len(latencies) / duration))
+    for label, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+        print("{:<11}: {:.1f} ms".format(label, percentile(latencies, fraction) * 1e3))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('url')
+    parser.add_argument('-c', '--concurrency', type=int, default=64)
+    parser.add_argument('-d', '--duration', type=float, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.concurrency, args.duration))
@@ -0,0 +1,41 @@
+"""
+Memory used by each process of a running gunicorn (or uvicorn) server.
+
+Reads /proc/<pid>/smaps_rollup (Linux) for the master and its workers. RSS
+counts shared pages once per process. PSS splits them between the processes
+sharing them, so it shows what preload_app saves. USS is what a worker alone
+would free on exit.
+
+    python benchmarks/worker_memory.py <master pid>
+"""
+import sys
+
+
+def children(pid):
+    with open("/proc/{}/task/{}/children".format(pid, pid)) as f:
+        return [int(p) for p in f.read().split()]
+
+
+def rollup(pid):
+    fields = {}
+    with open("/proc/{}/smaps_rollup".format(pid)) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    uss = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return fields.get('Rss', 0), fields.get('Pss', 0), uss
+
+
+def main(master):
+    print("{:<8} {:<7} {:>10} {:>10} {:>10}".format("pid", "role", "RSS MB", "PSS MB", "USS MB"))
+    totals = [0, 0, 0]
+    for role, pid in [("master", master)] + [("worker", p) for p in children(master)]:
+        values = rollup(pid)
+        totals = [t + v for t, v in zip(totals, values)]
+        print("{:<8} {:<7} {:>10.1f} {:>10.1f} {:>10.1f}".format(pid, role, *[v / 1024 for v in values]))
+    print("{:<16} {:>10.1f} {:>10.1f} {:>10.1f}".format("total", *[v / 1024 for v in totals]))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]))
@@ -0,0 +1,112 @@
+"""
+Gunicorn settings for the web process (see Procfile and render.yaml).
+
+Every value can be overridden from the environment:
+
+- WEB_CONCURRENCY: worker processes, default 2 per usable CPU + 1, capped by
+  GUNICORN_MAX_WORKERS (default 8) so small instances do not run out of memory.
+  Usable CPUs honour the CPU set and the cgroup CPU quota of the container.
+- GUNICORN_THREADS: threads per worker, default 4. Requests spend most of
+  their time waiting on the database, so threads raise throughput per MB.
+- GUNICORN_PRELOAD: import the app once in the master (default true) so
+  workers share its memory pages copy-on-write and fork faster
+- GUNICORN_TIMEOUT, GUNICORN_MAX_REQUESTS, GUNICORN_MAX_REQUESTS_JITTER
+
+With more than one worker the cache must be shared, or each worker keeps its
+own table versions and answers 304s and cached lists for rows another worker
+changed. Unless CACHE_URL is set, it defaults to an SQLite file on tmpfs
+(see src/cache.py); an explicit memory:// with several workers is refused.
+PASSWORD_HASH_WORKERS likewise defaults to the usable CPUs split between
+the workers, at least one each (see src/passwords.py).
+
+How to measure the effect is described in docs/PERFORMANCE.md.
+"""
+import os
+import math
+import tempfile
+
+
+def _cpu_quota():
+    """CPUs allowed by the cgroup CPU quota (v2, then v1), or None if unlimited."""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota == 'max':
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        return quota / period if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def _usable_cpus():
+    # sched_getaffinity honours container CPU sets; cpu_count() does not,
+    # and neither sees a CPU quota (e.g. half a CPU on small PaaS plans)
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(int(math.ceil(quota)), 1))
+    return cpus
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+workers = _env_int('WEB_CONCURRENCY', min(_usable_cpus() * 2 + 1, _env_int('GUNICORN_MAX_WORKERS', 8)))
+threads = _env_int('GUNICORN_THREADS', 4)
+worker_class = 'gthread' if threads > 1 else 'sync'
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+
+# Read by src/cache.py when the app is imported, which happens after this file
+if workers > 1:
+    if 'CACHE_URL' not in os.environ:
+        shm = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        os.environ['CACHE_URL'] = 'file://' + os.path.join(shm, 'api-cache-{}.sqlite3'.format(os.getuid()))
+    elif os.environ['CACHE_URL'].startswith('memory://'):
+        raise RuntimeError("CACHE_URL=memory:// is per process: with {} workers use a file:// or redis:// "
+                           "cache, or set WEB_CONCURRENCY=1".format(workers))
+# Read by src/passwords.py: share the usable CPUs between the workers'
+# hashing pools instead of giving each one a thread per host CPU
+os.environ.setdefault('PASSWORD_HASH_WORKERS', str(max(_usable_cpus() // workers, 1)))
+keepalive = 5
+# Recycle workers now and then to bound slow memory growth; jitter keeps
+# them from restarting all at once
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 2000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 200)
+
+
+def post_fork(server, worker):
+    # Connections opened in the master must not be shared with the children.
+    # close=False leaves them to the master instead of closing its sockets
+    # from every worker; each worker then opens its own pool lazily.
+    if not preload_app:
+        return
+    from models import db
+    with server.app.wsgi().app_context():
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    # Build the in-process autocomplete index before taking requests. On a
+    # database without the tables yet, leave it to the first request.
+    app = worker.wsgi
+    if 'api' not in app.config.get('APP_FEATURES', ()):
+        return
+    from autocomplete import warm
+    try:
+        with app.app_context():
+            warm()
+    except Exception as error:
+        worker.log.warning("Autocomplete index not built at startup: %s", error)
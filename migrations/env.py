@@ -32,6 +32,16 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+# Postgres-only GIN expression indexes created by the search_indexes
+# migration; they are not on the models (SQLite cannot build them), so
+# autogenerate must not treat them as removed
+UNMANAGED_INDEXES = {'ix_people_search', 'ix_planet_search'}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (type_ == 'index' and name in UNMANAGED_INDEXES)
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -52,7 +62,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -84,6 +95,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=get_metadata(),
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
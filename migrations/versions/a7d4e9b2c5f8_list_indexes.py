@@ -0,0 +1,37 @@
+"""list filter and sort indexes
+
+Revision ID: a7d4e9b2c5f8
+Revises: f1c6d3e8a2b7
+Create Date: 2026-10-16 16:48:30.915247
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d4e9b2c5f8'
+down_revision = 'f1c6d3e8a2b7'
+branch_labels = None
+depends_on = None
+
+# (table, column) pairs whitelisted in src/listing.py. Each (column, id)
+# index serves both an equality filter and a keyset sort on the column.
+LIST_COLUMNS = [
+    ('people', 'name'),
+    ('people', 'gender'),
+    ('people', 'birth_year'),
+    ('planet', 'name'),
+    ('planet', 'climate'),
+    ('planet', 'terrain'),
+]
+
+
+def upgrade():
+    for table, column in LIST_COLUMNS:
+        op.create_index('ix_{}_{}_id'.format(table, column), table, [column, 'id'], unique=False)
+
+
+def downgrade():
+    for table, column in reversed(LIST_COLUMNS):
+        op.drop_index('ix_{}_{}_id'.format(table, column), table_name=table)
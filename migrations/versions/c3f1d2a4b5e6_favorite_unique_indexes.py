@@ -0,0 +1,38 @@
+"""favorite unique indexes
+
+Revision ID: c3f1d2a4b5e6
+Revises: 5a7506cb8036
+Create Date: 2026-10-16 10:12:31.482113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f1d2a4b5e6'
+down_revision = '5a7506cb8036'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Duplicates left by the old check-then-insert race would block the
+    # unique indexes; keep the oldest row of each pair.
+    op.execute(
+        "DELETE FROM favorite WHERE planet_id IS NOT NULL AND id NOT IN "
+        "(SELECT MIN(id) FROM favorite WHERE planet_id IS NOT NULL GROUP BY user_id, planet_id)"
+    )
+    op.execute(
+        "DELETE FROM favorite WHERE people_id IS NOT NULL AND id NOT IN "
+        "(SELECT MIN(id) FROM favorite WHERE people_id IS NOT NULL GROUP BY user_id, people_id)"
+    )
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.create_index('ix_favorite_user_planet', ['user_id', 'planet_id'], unique=True)
+        batch_op.create_index('ix_favorite_user_people', ['user_id', 'people_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.drop_index('ix_favorite_user_people')
+        batch_op.drop_index('ix_favorite_user_planet')
@@ -0,0 +1,57 @@
+"""hash user passwords
+
+Revision ID: d8e2f7a1c9b3
+Revises: c3f1d2a4b5e6
+Create Date: 2026-10-16 11:40:05.117529
+
+"""
+import os
+from alembic import op
+import sqlalchemy as sa
+from werkzeug.security import generate_password_hash
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e2f7a1c9b3'
+down_revision = 'c3f1d2a4b5e6'
+branch_labels = None
+depends_on = None
+
+user_table = sa.table('user', sa.column('id', sa.Integer), sa.column('password', sa.String))
+BATCH = 500
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password',
+               existing_type=sa.String(length=80),
+               type_=sa.String(length=255),
+               existing_nullable=False)
+
+    # Hash the plain text passwords stored so far. Rows already hashed (by a
+    # worker that was deployed first) are left alone.
+    method = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(user_table.c.id, user_table.c.password)
+            .where(user_table.c.id > last_id).order_by(user_table.c.id).limit(BATCH)
+        ).all()
+        if not rows:
+            break
+        for user_id, password in rows:
+            if not (password.startswith(('scrypt:', 'pbkdf2:')) and password.count('$') == 2):
+                conn.execute(user_table.update().where(user_table.c.id == user_id)
+                             .values(password=generate_password_hash(password, method)))
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    # Hashes cannot be turned back into passwords, and would not fit in 80
+    # characters: only downgrade after resetting them.
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password',
+               existing_type=sa.String(length=255),
+               type_=sa.String(length=80),
+               existing_nullable=False)
@@ -0,0 +1,38 @@
+"""search indexes
+
+Revision ID: f1c6d3e8a2b7
+Revises: e4b7a2c9d1f6
+Create Date: 2026-10-16 15:22:09.640371
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6d3e8a2b7'
+down_revision = 'e4b7a2c9d1f6'
+branch_labels = None
+depends_on = None
+
+# Must stay identical to DOCUMENTS in src/search.py, or the planner will not
+# use the indexes
+PEOPLE_DOCUMENT = "setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A')"
+PLANET_DOCUMENT = ("setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') || "
+                   "setweight(to_tsvector('simple'::regconfig, "
+                   "coalesce(climate, '') || ' ' || coalesce(terrain, '')), 'B')")
+
+
+def upgrade():
+    # Only Postgres has tsvector; other databases search in process
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.create_index('ix_people_search', 'people', [sa.text('({})'.format(PEOPLE_DOCUMENT))], postgresql_using='gin')
+    op.create_index('ix_planet_search', 'planet', [sa.text('({})'.format(PLANET_DOCUMENT))], postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_planet_search', table_name='planet')
+    op.drop_index('ix_people_search', table_name='people')
@@ -2,6 +2,15 @@ import os
 from flask_admin import Admin
 from models import db, User
 from flask_admin.contrib.sqla import ModelView
+from passwords import is_hashed, hash_password
+
+class UserView(ModelView):
+    column_exclude_list = ['password']
+
+    def on_model_change(self, form, model, is_created):
+        # Passwords typed into the admin form are stored hashed too
+        if not is_hashed(model.password):
+            model.password = hash_password(model.password)
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
@@ -10,7 +19,7 @@ def setup_admin(app):
 
     
     # Add your models here, for example this is how we add a the User model to the admin
-    admin.add_view(ModelView(User, db.session))
+    admin.add_view(UserView(User, db.session))
 
     # You can duplicate that line to add mew models
     # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
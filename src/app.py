@@ -1,194 +1,120 @@
 """
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
+
+create_app() builds the Flask app for one process role, chosen with the
+`role` argument or APP_ROLE, and only imports what that role uses:
+
+- all (default): every route, Swagger, Flask-Admin, CORS and Flask-Migrate
+- api: the JSON API with CORS, for web workers
+- docs: the JSON API plus the Swagger UI at /apidocs
+- admin: Flask-Admin alone, at /admin
+- migrations: just the models and Flask-Migrate, for `flask db ...`
+
+APP_FEATURES (a comma separated list of api, swagger, admin, cors, migrate)
+overrides APP_ROLE's feature set, but never an explicit `role` argument:
+create_app('migrations') always has Flask-Migrate.
 """
 import os
-from flask import Flask, request, jsonify, url_for, Blueprint
-from flask_migrate import Migrate
-from flasgger import Swagger
-from flask_cors import CORS
-from utils import APIException, generate_sitemap
-from admin import setup_admin
-from models import db, User, People, Planet, Favorite
-from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
-
-app = Flask(__name__)
-app.url_map.strict_slashes = False
-
-# Swagger UI
-Swagger(app)
-
-# Database config
-db_url = os.getenv("DATABASE_URL")
-if db_url is not None:
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace("postgres://", "postgresql://")
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
-
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# JWT config
-app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY", "super-secret-key")
-jwt = JWTManager(app)
-
-# Initialize extensions
-MIGRATE = Migrate(app, db)
-db.init_app(app)
-CORS(app)
-setup_admin(app)
-
-# Create blueprint for api routes
-api = Blueprint('api', __name__)
-
-# --- API ENDPOINTS ---
-
-# Hello world test
-@app.route('/')
-def sitemap():
-    return generate_sitemap(app)
-
-@app.route('/user', methods=['GET'])
-def handle_hello():
-    return jsonify({"msg": "Hello, this is your GET /user response"}), 200
-
-# Example register user (not required, since you add users via admin)
-@app.route('/signup', methods=['POST'])
-def signup():
-    data = request.get_json()
-    email = data.get('email')
-    password = data.get('password')
-    if not email or not password:
-        return jsonify({"error": "Missing email or password"}), 400
-    if User.query.filter_by(email=email).first():
-        return jsonify({"error": "Email already exists"}), 400
-    user = User(email=email, password=password, is_active=True)
-    db.session.add(user)
-    db.session.commit()
-    return jsonify({"msg": "User created"}), 201
-
-# Login endpoint to get JWT token
-@app.route('/login', methods=['POST'])
-def login():
-    data = request.get_json()
-    email = data.get('email')
-    password = data.get('password')
-    user = User.query.filter_by(email=email, password=password).first()
-    if not user:
-        return jsonify({"error": "Invalid credentials"}), 401
-    access_token = create_access_token(identity=user.id)
-    return jsonify({"token": access_token}), 200
-
-# GET /people - list all people
-@api.route('/people', methods=['GET'])
-def get_people():
-    people = People.query.all()
-    return jsonify([p.serialize() for p in people]), 200
-
-# GET /people/<int:id> - get one person
-@api.route('/people/<int:people_id>', methods=['GET'])
-def get_person(people_id):
-    person = People.query.get(people_id)
-    if not person:
-        return jsonify({"error": "Person not found"}), 404
-    return jsonify(person.serialize()), 200
-
-# GET /planets - list all planets
-@api.route('/planets', methods=['GET'])
-def get_planets():
-    planets = Planet.query.all()
-    return jsonify([p.serialize() for p in planets]), 200
-
-# GET /planets/<int:id> - get one planet
-@api.route('/planets/<int:planet_id>', methods=['GET'])
-def get_planet(planet_id):
-    planet = Planet.query.get(planet_id)
-    if not planet:
-        return jsonify({"error": "Planet not found"}), 404
-    return jsonify(planet.serialize()), 200
-
-# GET /users - list all users
-@api.route('/users', methods=['GET'])
-def get_users():
-    users = User.query.all()
-    return jsonify([u.serialize() for u in users]), 200
-
-# GET /users/favorites - list current user's favorites
-@api.route('/users/favorites', methods=['GET'])
-@jwt_required()
-def get_favorites():
-    current_user_id = get_jwt_identity()
-    favorites = Favorite.query.filter_by(user_id=current_user_id).all()
-    return jsonify([f.serialize() for f in favorites]), 200
-
-# POST /favorite/planet/<int:planet_id> - add favorite planet
-@api.route('/favorite/planet/<int:planet_id>', methods=['POST'])
-@jwt_required()
-def add_favorite_planet(planet_id):
-    current_user_id = get_jwt_identity()
-    planet = Planet.query.get(planet_id)
-    if not planet:
-        return jsonify({"error": "Planet not found"}), 404
-    exists = Favorite.query.filter_by(user_id=current_user_id, planet_id=planet_id).first()
-    if exists:
-        return jsonify({"msg": "Planet already in favorites"}), 400
-    fav = Favorite(user_id=current_user_id, planet_id=planet_id)
-    db.session.add(fav)
-    db.session.commit()
-    favorites = Favorite.query.filter_by(user_id=current_user_id).all()
-    return jsonify([f.serialize() for f in favorites]), 200
-
-# POST /favorite/people/<int:people_id> - add favorite person
-@api.route('/favorite/people/<int:people_id>', methods=['POST'])
-@jwt_required()
-def add_favorite_person(people_id):
-    current_user_id = get_jwt_identity()
-    person = People.query.get(people_id)
-    if not person:
-        return jsonify({"error": "Person not found"}), 404
-    exists = Favorite.query.filter_by(user_id=current_user_id, people_id=people_id).first()
-    if exists:
-        return jsonify({"msg": "Person already in favorites"}), 400
-    fav = Favorite(user_id=current_user_id, people_id=people_id)
-    db.session.add(fav)
-    db.session.commit()
-    favorites = Favorite.query.filter_by(user_id=current_user_id).all()
-    return jsonify([f.serialize() for f in favorites]), 200
-
-# DELETE /favorite/planet/<int:planet_id> - remove favorite planet
-@api.route('/favorite/planet/<int:planet_id>', methods=['DELETE'])
-@jwt_required()
-def remove_favorite_planet(planet_id):
-    current_user_id = get_jwt_identity()
-    fav = Favorite.query.filter_by(user_id=current_user_id, planet_id=planet_id).first()
-    if not fav:
-        return jsonify({"error": "Favorite planet not found"}), 404
-    db.session.delete(fav)
-    db.session.commit()
-    favorites = Favorite.query.filter_by(user_id=current_user_id).all()
-    return jsonify([f.serialize() for f in favorites]), 200
-
-# DELETE /favorite/people/<int:people_id> - remove favorite person
-@api.route('/favorite/people/<int:people_id>', methods=['DELETE'])
-@jwt_required()
-def remove_favorite_person(people_id):
-    current_user_id = get_jwt_identity()
-    fav = Favorite.query.filter_by(user_id=current_user_id, people_id=people_id).first()
-    if not fav:
-        return jsonify({"error": "Favorite person not found"}), 404
-    db.session.delete(fav)
-    db.session.commit()
-    favorites = Favorite.query.filter_by(user_id=current_user_id).all()
-    return jsonify([f.serialize() for f in favorites]), 200
-
-# Register blueprint
-app.register_blueprint(api, url_prefix='/api')
-
-# Error handler
-@app.errorhandler(APIException)
-def handle_invalid_usage(error):
-    return jsonify(error.to_dict()), error.status_code
+from flask import Flask, jsonify
+from utils import APIException
+from json_provider import FastJSONProvider
+from db_pool import engine_options
+from models import db
+
+ROLES = {
+    'all': {'api', 'swagger', 'admin', 'cors', 'migrate'},
+    'api': {'api', 'cors'},
+    'docs': {'api', 'swagger', 'cors'},
+    'admin': {'admin'},
+    'migrations': {'migrate'},
+}
+
+
+def database_uri():
+    db_url = os.getenv("DATABASE_URL")
+    if db_url is not None:
+        return db_url.replace("postgres://", "postgresql://")
+    return "sqlite:////tmp/test.db"
+
+
+def app_features(role=None):
+    if role is None:
+        features = os.environ.get('APP_FEATURES')
+        if features is not None:
+            return {f.strip() for f in features.split(',') if f.strip()}
+        role = os.environ.get('APP_ROLE', 'all')
+    if role not in ROLES:
+        raise ValueError("Unknown APP_ROLE: {}".format(role))
+    return ROLES[role]
+
+
+def create_app(role=None, config=None):
+    features = app_features(role)
+    role = role or os.environ.get('APP_ROLE', 'all')
+
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+    app.json = FastJSONProvider(app)
+
+    # Database config
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # JWT config
+    app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY", "super-secret-key")
+
+    app.config['APP_ROLE'] = role
+    app.config['APP_FEATURES'] = sorted(features)
+    app.config.update(config or {})
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+
+    # Behind a reverse proxy, trust its X-Forwarded-For for the client IP
+    trusted_proxies = int(os.environ.get('TRUSTED_PROXIES', 0))
+    if trusted_proxies:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
+
+    # Initialize extensions
+    db.init_app(app)
+
+    if 'migrate' in features:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    if features & {'api', 'admin'}:
+        # Cache invalidation listeners: rows edited from /admin must drop
+        # cached copies just like API writes do
+        import cache, favorites  # noqa: F401
+
+    if 'api' in features:
+        from routes import jwt, site, api
+        jwt.init_app(app)
+        app.register_blueprint(site)
+        app.register_blueprint(api, url_prefix='/api')
+
+    if 'swagger' in features:
+        from flasgger import Swagger
+        Swagger(app)
+
+    if 'cors' in features:
+        from flask_cors import CORS
+        CORS(app)
+
+    if 'admin' in features:
+        from admin import setup_admin
+        setup_admin(app)
+
+    # Error handler
+    @app.errorhandler(APIException)
+    def handle_invalid_usage(error):
+        return jsonify(error.to_dict()), error.status_code
+
+    return app
+
 
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3000))
+    app = create_app()
     with app.app_context():
      db.create_all()
     app.run(host='0.0.0.0', port=PORT, debug=False)
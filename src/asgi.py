@@ -0,0 +1,152 @@
+"""
+ASGI entry point serving the catalogue reads on async SQLAlchemy.
+
+    uvicorn asgi:application --app-dir src --workers 4
+
+GET /api/people, /api/planets (plain or with ?limit=&after=), their detail
+routes and GET /api/users run on an AsyncSession (asyncpg for Postgres,
+aiosqlite for SQLite), so a worker keeps serving other requests while it
+waits on the database. Every other request, including writes, login, /admin
+and the list options handled by the Flask views (?ids=, ?stream=...), goes to
+the Flask app through a WSGI adapter, so the API is the same in both modes.
+
+Native responses skip the Flask cache and ETag layers: they are the
+database-bound baseline the load test in benchmarks/ compares against.
+"""
+import re
+from urllib.parse import parse_qs
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app import create_app
+from models import User, People, Planet
+from db_pool import engine_options
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, MAX_LIST_ROWS, encode_cursor, decode_cursor
+from utils import APIException, join_fragments
+
+ASYNC_DRIVERS = {'postgresql://': 'postgresql+asyncpg://', 'sqlite://': 'sqlite+aiosqlite://'}
+NATIVE_ROUTES = [
+    (re.compile(r'^/api/people/?$'), People, False),
+    (re.compile(r'^/api/people/(\d+)/?$'), People, True),
+    (re.compile(r'^/api/planets/?$'), Planet, False),
+    (re.compile(r'^/api/planets/(\d+)/?$'), Planet, True),
+    (re.compile(r'^/api/users/?$'), User, False),
+]
+PAGE_ARGS = {'limit', 'after'}
+NOT_FOUND = {People: "Person not found", Planet: "Planet not found"}
+
+
+def async_database_url(uri):
+    for prefix, async_prefix in ASYNC_DRIVERS.items():
+        if uri.startswith(prefix):
+            return async_prefix + uri[len(prefix):]
+    return uri
+
+
+def async_engine_options(uri):
+    # InstrumentedQueuePool is sync only; the async engine brings its own pool
+    return {k: v for k, v in engine_options(uri).items() if k != 'poolclass'}
+
+
+flask_app = create_app()
+_database_uri = flask_app.config['SQLALCHEMY_DATABASE_URI']
+engine = create_async_engine(async_database_url(_database_uri), **async_engine_options(_database_uri))
+Session = async_sessionmaker(engine, expire_on_commit=False)
+dumps = flask_app.json.dumps_bytes
+wsgi = WSGIMiddleware(flask_app)
+# The header Flask-CORS adds with its defaults, only where the role has it
+CORS_HEADERS = ([(b"access-control-allow-origin", b"*")]
+                if 'cors' in flask_app.config['APP_FEATURES'] else [])
+
+
+async def send_json(send, body, status=200, headers=()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())] + CORS_HEADERS + list(headers),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def get_one(model, entity_id):
+    async with Session() as session:
+        row = await session.get(model, entity_id)
+    if row is None:
+        return 404, dumps({"error": NOT_FOUND[model]}), ()
+    return 200, dumps(row.serialize()), ()
+
+
+async def get_page(model, args):
+    if model is User:
+        limit, after = None, None
+    elif PAGE_ARGS & set(args):
+        try:
+            limit = int(args.get('limit', [DEFAULT_PAGE_SIZE])[0])
+        except ValueError:
+            raise APIException("limit must be an integer", status_code=400)
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            raise APIException("limit must be between 1 and {}".format(MAX_PAGE_SIZE), status_code=400)
+        after = decode_cursor(args['after'][0]) if 'after' in args else None
+    else:
+        limit, after = MAX_LIST_ROWS, None
+
+    stmt = select(model).order_by(model.id)
+    if after is not None:
+        stmt = stmt.where(model.id > after)
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    async with Session() as session:
+        rows = list(await session.scalars(stmt))
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    body = join_fragments(dumps(row.serialize()) for row in rows)
+    if PAGE_ARGS & set(args):
+        return 200, b'{"results":' + body + b',"next":' + dumps(next_cursor) + b'}', ()
+    headers = [(b"x-next-cursor", next_cursor.encode())] if next_cursor else []
+    return 200, body, headers
+
+
+def match_native(scope):
+    """Return a coroutine for requests served natively, None for Flask ones."""
+    if scope["method"] != "GET":
+        return None
+    accept = dict(scope["headers"]).get(b"accept", b"")
+    if b"application/x-ndjson" in accept:
+        return None
+    args = parse_qs(scope["query_string"].decode("latin-1"))
+    for pattern, model, detail in NATIVE_ROUTES:
+        match = pattern.match(scope["path"])
+        if not match:
+            continue
+        if detail:
+            return None if args else get_one(model, int(match.group(1)))
+        if set(args) - PAGE_ARGS or (model is User and args):
+            return None
+        return get_page(model, args)
+    return None
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    handler = match_native(scope) if scope["type"] == "http" else None
+    if handler is None:
+        await wsgi(scope, receive, send)
+        return
+    try:
+        status, body, headers = await handler
+    except APIException as error:
+        status, body, headers = error.status_code, dumps(error.to_dict()), ()
+    await send_json(send, body, status, headers)
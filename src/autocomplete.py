@@ -0,0 +1,181 @@
+"""
+Type-ahead over people and planet names, for GET /api/autocomplete.
+
+Each worker keeps a sorted array of name keys per entity type: the
+lower-cased name from the start of every word, so "sky" finds "Luke
+Skywalker" as well as names starting with it. A prefix is answered with two
+binary searches and a bounded slice per type, without touching the database.
+
+gunicorn.conf.py builds the array when a worker starts, and other processes
+build it on the first request. Committed changes, local or replayed from
+other workers, mark rows for a re-read before the next lookup, as search.py
+does.
+"""
+import os
+import threading
+from bisect import bisect_left
+from flask import request
+from sqlalchemy import select
+from events import subscribe
+from models import db, People, Planet
+from utils import APIException
+from cache import dumps
+
+AUTOCOMPLETE_DEFAULT_LIMIT = int(os.environ.get('AUTOCOMPLETE_DEFAULT_LIMIT', 10))
+AUTOCOMPLETE_MAX_LIMIT = int(os.environ.get('AUTOCOMPLETE_MAX_LIMIT', 25))
+MAX_PREFIX_LENGTH = 100
+
+TYPES = {'people': People, 'planets': Planet}
+
+
+def name_keys(name):
+    """The lower-cased name from the start of each of its words."""
+    lowered = name.lower()
+    starts = [i for i, c in enumerate(lowered) if c.isalnum() and (i == 0 or not lowered[i - 1].isalnum())]
+    return sorted({lowered[i:] for i in starts})
+
+
+def rank(matches, prefix):
+    return sorted(matches, key=lambda m: (not m[1].lower().startswith(prefix), len(m[1]), m[1], m[0]))
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.keys = []
+        self.refs = []
+        self.names = {}
+        self.lock = threading.RLock()
+
+    def add(self, ref, name):
+        with self.lock:
+            self.remove(ref)
+            if not name:
+                return
+            for key in name_keys(name):
+                # Equal keys are ordered by ref, so removal can find its own
+                position = bisect_left(self.keys, key)
+                while position < len(self.keys) and self.keys[position] == key and self.refs[position] < ref:
+                    position += 1
+                self.keys.insert(position, key)
+                self.refs.insert(position, ref)
+            self.names[ref] = name
+
+    def remove(self, ref):
+        with self.lock:
+            name = self.names.pop(ref, None)
+            if name is None:
+                return
+            for key in name_keys(name):
+                position = bisect_left(self.keys, key)
+                while self.refs[position] != ref:
+                    position += 1
+                del self.keys[position]
+                del self.refs[position]
+
+    def load(self, entries):
+        """Replace the contents with `(ref, name)` pairs in one sort."""
+        pairs = sorted((key, ref) for ref, name in entries if name for key in name_keys(name))
+        names = {ref: name for ref, name in entries if name}
+        with self.lock:
+            self.keys = [key for key, _ in pairs]
+            self.refs = [ref for _, ref in pairs]
+            self.names = names
+
+    def lookup(self, prefix, limit):
+        """Up to `limit` `(ref, name)` matches: whole-name prefixes, then shorter names first."""
+        with self.lock:
+            start = bisect_left(self.keys, prefix)
+            end = bisect_left(self.keys, prefix + '\U0010ffff', start)
+            matches = {}
+            # Scan at most a bounded window of the range; very short prefixes
+            # can match most of the catalogue
+            for position in range(start, min(end, start + limit * 20)):
+                ref = self.refs[position]
+                if ref not in matches:
+                    matches[ref] = self.names[ref]
+        return rank(matches.items(), prefix)[:limit]
+
+    def __len__(self):
+        return len(self.names)
+
+
+class Autocomplete:
+    def __init__(self):
+        # One index per type, so a ?type= lookup never scans the other's keys
+        self.indexes = {kind: PrefixIndex() for kind in TYPES}
+        self.pid = None
+        self.stale = set()
+        self.lock = threading.Lock()
+
+    def _rows(self, kind, ids=None):
+        model = TYPES[kind]
+        stmt = select(model.id, model.name)
+        if ids is not None:
+            stmt = stmt.where(model.id.in_(ids))
+        return [((kind, entity_id), name) for entity_id, name in
+                db.session.execute(stmt.execution_options(yield_per=10000))]
+
+    def refresh(self):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.stale.clear()
+                for kind, index in self.indexes.items():
+                    index.load(self._rows(kind))
+                self.pid = os.getpid()
+            elif self.stale:
+                stale, self.stale = self.stale, set()
+                for kind in TYPES:
+                    ids = {entity_id for k, entity_id in stale if k == kind}
+                    if not ids:
+                        continue
+                    rows = self._rows(kind, ids)
+                    for ref, name in rows:
+                        self.indexes[kind].add(ref, name)
+                    for entity_id in ids - {ref[1] for ref, _ in rows}:
+                        self.indexes[kind].remove((kind, entity_id))
+
+    def lookup(self, prefix, kinds, limit):
+        self.refresh()
+        matches = [match for kind in kinds for match in self.indexes[kind].lookup(prefix, limit)]
+        return rank(matches, prefix)[:limit]
+
+
+autocomplete = Autocomplete()
+TABLES = {model.__tablename__: kind for kind, model in TYPES.items()}
+
+
+def warm():
+    """Build this process' index now rather than on the first request."""
+    autocomplete.refresh()
+
+
+@subscribe
+def _mark_stale(tablename, ids):
+    kind = TABLES.get(tablename)
+    if kind is not None:
+        with autocomplete.lock:
+            autocomplete.stale.update((kind, entity_id) for entity_id in ids)
+
+
+def autocomplete_args():
+    prefix = request.args.get('prefix', '').strip().lower()
+    if not prefix:
+        raise APIException("prefix is required", status_code=400)
+    if len(prefix) > MAX_PREFIX_LENGTH:
+        raise APIException("prefix is too long", status_code=400)
+    kind = request.args.get('type')
+    if kind is not None and kind not in TYPES:
+        raise APIException("type must be one of: {}".format(', '.join(TYPES)), status_code=400)
+    try:
+        limit = int(request.args.get('limit', AUTOCOMPLETE_DEFAULT_LIMIT))
+    except ValueError:
+        raise APIException("limit must be an integer", status_code=400)
+    if limit < 1 or limit > AUTOCOMPLETE_MAX_LIMIT:
+        raise APIException("limit must be between 1 and {}".format(AUTOCOMPLETE_MAX_LIMIT), status_code=400)
+    return prefix, {kind} if kind else set(TYPES), limit
+
+
+def autocomplete_body(prefix, kinds, limit):
+    matches = autocomplete.lookup(prefix, kinds, limit)
+    return dumps({"results": [{"type": kind, "id": entity_id, "name": name}
+                              for (kind, entity_id), name in matches]})
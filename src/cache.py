@@ -0,0 +1,482 @@
+"""
+Cache layer shared by the list and detail endpoints.
+
+The backend is picked from CACHE_URL:
+
+- `memory://` (default) keeps entries in this process, in a bounded LRU with
+  a TTL. Exact with a single worker, cold and unshared with several.
+- `file:///dev/shm/api-cache.sqlite3` keeps entries in an SQLite file opened
+  by every worker on the host; on a tmpfs path it is effectively shared memory.
+- `redis://host:6379/0` talks to any server speaking the Redis protocol
+  (redis-server, KeyDB, a local stand-in...) and needs the `redis` package.
+
+Catalogue rows are stored pre-encoded, as the JSON bytes of `serialize()`,
+under `entity:<table>:<id>`, so responses are assembled by concatenation.
+Every table also has a version counter in the backend, bumped whenever a
+change to that table commits; the ETags and the cached list pages are keyed on it. The
+committing process deletes the affected entries, bumps the version and
+publishes an invalidation message. The other workers replay that message
+through events.notify, so anything they keep in process memory follows.
+"""
+import os
+import json
+import time
+import uuid
+import random
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from urllib.parse import urlparse
+from flask import current_app
+from events import subscribe, notify
+
+CACHE_URL = os.environ.get('CACHE_URL', 'memory://')
+CACHE_SIZE = int(os.environ.get('CACHE_SIZE', 10000))
+CACHE_TTL = int(os.environ.get('CACHE_TTL', 300))
+INVALIDATION_CHANNEL = 'api:invalidate'
+# Pause before a listener reconnects after an error
+LISTEN_RETRY = 1
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class BaseBackend:
+    """Common bookkeeping; subclasses store bytes values under string keys."""
+    name = None
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        values = self._get_many(keys) if keys else []
+        found = sum(1 for v in values if v is not None)
+        self.hits += found
+        self.misses += len(values) - found
+        return values
+
+    def publish(self, message):
+        pass
+
+    def listen(self, callback):
+        pass
+
+    def _deliver(self, callback, message):
+        # A bad message must not end the listener thread
+        try:
+            callback(message)
+        except Exception:
+            logger.exception("Invalidation message failed: %r", message)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class MemoryBackend(BaseBackend):
+    name = 'memory'
+
+    def __init__(self, maxsize, ttl):
+        super().__init__(ttl)
+        self.store = LRUCache(maxsize, ttl)
+        self._counters = {}
+        # Counters with a ttl are short-lived and keyed by client, so bound them
+        self._expiring = LRUCache(maxsize, ttl)
+        self._lock = threading.Lock()
+
+    def _get_many(self, keys):
+        return [self.store.get(k) for k in keys]
+
+    def set(self, key, value, ttl=None):
+        self.store.set(key, value, ttl)
+
+    def set_many(self, mapping, ttl=None):
+        for key, value in mapping.items():
+            self.store.set(key, value, ttl)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.store.delete(key)
+
+    def counter(self, key):
+        value = self._counters.get(key)
+        return value if value is not None else self._expiring.get(key)
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._lock:
+            if ttl is not None:
+                value = (self._expiring.get(key) or 0) + amount
+                self._expiring.set(key, value, ttl)
+                return value
+            self._counters[key] = self._counters.get(key, 0) + amount
+            return self._counters[key]
+
+    def stats(self):
+        rv = super().stats()
+        rv.update(size=len(self.store), maxsize=self.store.maxsize, evictions=self.store.evictions)
+        return rv
+
+
+class FileBackend(BaseBackend):
+    """SQLite file shared by all workers on a host; messages are polled."""
+    name = 'file'
+    schema = """
+        CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL);
+        CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS expiring_counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires REAL);
+        CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY AUTOINCREMENT, body TEXT, created REAL);
+    """
+    poll_interval = 0.5
+    message_retention = 60
+    purge_every = 1000
+
+    def __init__(self, path, ttl):
+        super().__init__(ttl)
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._conn().executescript(self.schema)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self, mode=''):
+        # Connections are in autocommit mode; group writes explicitly
+        conn = self._conn()
+        conn.execute("BEGIN " + mode)
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _get_many(self, keys):
+        found = {}
+        now = time.time()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            sql = "SELECT key, value FROM cache WHERE expires > ? AND key IN ({})".format(
+                ",".join("?" * len(chunk)))
+            found.update(self._conn().execute(sql, [now] + chunk).fetchall())
+        return [found.get(k) for k in keys]
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, mapping, ttl=None):
+        expires = time.time() + (ttl or self.ttl)
+        with self._transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+                             [(k, v, expires) for k, v in mapping.items()])
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self._conn().execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+
+    def delete(self, *keys):
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k in keys])
+
+    def counter(self, key):
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            row = conn.execute("SELECT value FROM expiring_counters WHERE key = ? AND expires > ?",
+                               (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def incr(self, key, amount=1, ttl=None):
+        if ttl is not None:
+            return self._incr_expiring(key, amount, ttl)
+        with self._transaction('IMMEDIATE') as conn:
+            conn.execute("INSERT OR IGNORE INTO counters VALUES (?, 0)", (key,))
+            conn.execute("UPDATE counters SET value = value + ? WHERE key = ?", (amount, key))
+            return conn.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()[0]
+
+    def _incr_expiring(self, key, amount, ttl):
+        now = time.time()
+        with self._transaction('IMMEDIATE') as conn:
+            conn.execute("DELETE FROM expiring_counters WHERE key = ? AND expires < ?", (key, now))
+            conn.execute("INSERT OR IGNORE INTO expiring_counters VALUES (?, 0, ?)", (key, now + ttl))
+            conn.execute("UPDATE expiring_counters SET value = value + ?, expires = ? WHERE key = ?",
+                         (amount, now + ttl, key))
+            value = conn.execute("SELECT value FROM expiring_counters WHERE key = ?", (key,)).fetchone()[0]
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self._conn().execute("DELETE FROM expiring_counters WHERE expires < ?", (now,))
+        return value
+
+    def publish(self, message):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("INSERT INTO messages (body, created) VALUES (?, ?)", (message, now))
+            conn.execute("DELETE FROM messages WHERE created < ?", (now - self.message_retention,))
+
+    def listen(self, callback):
+        def poll():
+            last = None
+            while True:
+                try:
+                    conn = self._conn()
+                    if last is None:
+                        last = conn.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+                    time.sleep(self.poll_interval)
+                    rows = conn.execute("SELECT id, body FROM messages WHERE id > ? ORDER BY id",
+                                        (last,)).fetchall()
+                except Exception:
+                    # e.g. a locked or replaced file: reopen it. Messages are
+                    # kept for message_retention seconds, so the next poll
+                    # catches up
+                    logger.exception("Polling the cache invalidation messages failed")
+                    self._local.conn = None
+                    time.sleep(LISTEN_RETRY)
+                    continue
+                for last, body in rows:
+                    self._deliver(callback, body)
+        threading.Thread(target=poll, name='cache-invalidation', daemon=True).start()
+
+
+class RedisBackend(BaseBackend):
+    name = 'redis'
+
+    def __init__(self, url, ttl):
+        super().__init__(ttl)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL points at a Redis server but the `redis` package is not installed")
+        self.client = redis.Redis.from_url(url)
+
+    def _get_many(self, keys):
+        return self.client.mget(keys)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, ex=ttl or self.ttl)
+
+    def set_many(self, mapping, ttl=None):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.set(key, value, ex=ttl or self.ttl)
+        pipe.execute()
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+    def counter(self, key):
+        value = self.client.get(key)
+        return int(value) if value is not None else None
+
+    def incr(self, key, amount=1, ttl=None):
+        if ttl is None:
+            return self.client.incrby(key, amount)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.incrby(key, amount)
+        pipe.expire(key, ttl)
+        return pipe.execute()[0]
+
+    def publish(self, message):
+        self.client.publish(INVALIDATION_CHANNEL, message)
+
+    def listen(self, callback):
+        def run():
+            while True:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                try:
+                    pubsub.subscribe(INVALIDATION_CHANNEL)
+                    for message in pubsub.listen():
+                        self._deliver(callback, message['data'].decode('utf-8'))
+                except Exception:
+                    # Disconnected: subscribe again. Messages published in the
+                    # meantime are lost, as with any pub/sub subscriber
+                    logger.exception("Cache invalidation subscription failed, resubscribing")
+                    time.sleep(LISTEN_RETRY)
+                finally:
+                    pubsub.close()
+        threading.Thread(target=run, name='cache-invalidation', daemon=True).start()
+
+
+def make_backend(url):
+    scheme = urlparse(url).scheme
+    if scheme == 'memory':
+        return MemoryBackend(CACHE_SIZE, CACHE_TTL)
+    if scheme == 'file':
+        return FileBackend(urlparse(url).path, CACHE_TTL)
+    if scheme in ('redis', 'rediss', 'unix'):
+        return RedisBackend(url, CACHE_TTL)
+    raise ValueError("Unsupported CACHE_URL scheme: {}".format(scheme))
+
+
+_backend = None
+_backend_pid = None
+_backend_lock = threading.Lock()
+_origin = None
+
+
+def get_backend():
+    """Return this process' backend, rebuilding it after a fork.
+
+    Connections and listener threads do not survive fork(), so each gunicorn
+    worker opens its own the first time it touches the cache.
+    """
+    global _backend, _backend_pid, _origin
+    if _backend_pid != os.getpid():
+        with _backend_lock:
+            if _backend_pid != os.getpid():
+                _backend = make_backend(CACHE_URL)
+                _origin = uuid.uuid4().hex
+                _backend.listen(_on_message)
+                _backend_pid = os.getpid()
+    return _backend
+
+
+def dumps(data):
+    return current_app.json.dumps_bytes(data)
+
+
+def table_version(tablename):
+    backend = get_backend()
+    key = 'version:' + tablename
+    value = backend.counter(key)
+    if value is None:
+        # Random start so keys and ETags issued before a restart or a flush
+        # of the backend can never match the new counter
+        value = backend.incr(key, random.getrandbits(40) + 1)
+    return value
+
+
+def entity_key(tablename, entity_id):
+    return "entity:{}:{}".format(tablename, entity_id)
+
+
+def store_fragments(tablename, fragments, version):
+    """Cache `{id: json_bytes}` unless `tablename` changed since `version` was read."""
+    if not fragments or table_version(tablename) != version:
+        return
+    backend = get_backend()
+    entries = {entity_key(tablename, i): f for i, f in fragments.items()}
+    backend.set_many(entries)
+    # invalidate() may have run between the check and the write. It deletes
+    # again after bumping the version, so whatever the interleaving either
+    # its second delete or this re-check removes the old bytes
+    if table_version(tablename) != version:
+        backend.delete(*entries)
+
+
+def encode_rows(rows):
+    return {row.id: dumps(row.serialize()) for row in rows}
+
+
+def get_fragments(model, ids):
+    """Pre-encoded JSON of `model` rows for `ids`, in order, None where missing.
+
+    Cached fragments are served as stored bytes, with no dict building or
+    encoding; the rest are loaded with one IN query, encoded once and cached.
+    """
+    tablename = model.__tablename__
+    raw = get_backend().get_many([entity_key(tablename, i) for i in ids])
+    found = {i: v for i, v in zip(ids, raw) if v is not None}
+    missing = [i for i in ids if i not in found]
+    if missing:
+        version = table_version(tablename)
+        loaded = encode_rows(model.query.filter(model.id.in_(missing)))
+        store_fragments(tablename, loaded, version)
+        found.update(loaded)
+    return [found.get(i) for i in ids]
+
+
+def get_fragment(model, entity_id):
+    """Return the pre-encoded JSON of `model` row `entity_id`, or None."""
+    return get_fragments(model, [entity_id])[0]
+
+
+@subscribe(local_only=True)
+def invalidate(tablename, ids):
+    backend = get_backend()
+    keys = [entity_key(tablename, i) for i in ids]
+    backend.delete(*keys)
+    table_version(tablename)
+    backend.incr('version:' + tablename)
+    # Again, for a store_fragments() that checked the old version before the
+    # bump and wrote after the first delete
+    backend.delete(*keys)
+    backend.publish(json.dumps({"origin": _origin, "table": tablename, "ids": sorted(ids)}))
+
+
+def _on_message(message):
+    data = json.loads(message)
+    if data.get('origin') != _origin:
+        notify(data['table'], data['ids'], remote=True)
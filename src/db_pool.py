@@ -0,0 +1,117 @@
+"""
+Connection pool configuration and instrumentation.
+
+SQLALCHEMY_ENGINE_OPTIONS is built from the environment:
+
+- DB_POOL_SIZE (5), DB_MAX_OVERFLOW (10), DB_POOL_TIMEOUT (30 s)
+- DB_POOL_RECYCLE (1800 s), DB_POOL_PRE_PING (true), DB_POOL_USE_LIFO (true)
+
+Pre-ping drops connections the server closed (idle timeouts, restarts after a
+deploy) before a request uses them, and LIFO checkout lets surplus idle
+connections age out instead of keeping every one of them warm. Sizing options
+only apply to server databases; SQLite keeps SQLAlchemy's defaults.
+
+Per-process pool metrics (checked out, overflow, checkout wait histogram...)
+are reported on /internal/metrics.
+"""
+import os
+import time
+import bisect
+import threading
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool, QueuePool
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self.wait_total = 0.0
+
+    def observe_wait(self, seconds):
+        with self._lock:
+            self.wait_counts[bisect.bisect_left(WAIT_BUCKETS, seconds)] += 1
+            self.wait_total += seconds
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self, pool):
+        waits = sum(self.wait_counts)
+        rv = {
+            "pool_class": type(pool).__name__,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "wait_seconds": {
+                "count": waits,
+                "sum": round(self.wait_total, 6),
+                # Cumulative, Prometheus style: observations <= each bound
+                "buckets": {str(b): sum(self.wait_counts[:i + 1]) for i, b in enumerate(WAIT_BUCKETS)},
+            },
+        }
+        if isinstance(pool, QueuePool):
+            rv.update(size=pool.size(), checked_in=pool.checkedin(),
+                      checked_out=pool.checkedout(), overflow=pool.overflow())
+        return rv
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.incr('timeouts')
+            raise
+        finally:
+            pool_stats.observe_wait(time.perf_counter() - start)
+
+
+@event.listens_for(Pool, 'connect')
+def _on_connect(dbapi_connection, connection_record):
+    pool_stats.incr('connects')
+
+
+@event.listens_for(Pool, 'checkout')
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats.incr('checkouts')
+
+
+@event.listens_for(Pool, 'invalidate')
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_stats.incr('invalidations')
+
+
+def engine_options(database_uri):
+    options = {
+        "pool_pre_ping": _env_bool('DB_POOL_PRE_PING', True),
+        "pool_recycle": int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    if not database_uri.startswith('sqlite'):
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=int(os.environ.get('DB_POOL_SIZE', 5)),
+            max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            pool_timeout=int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            pool_use_lifo=_env_bool('DB_POOL_USE_LIFO', True),
+        )
+    return options
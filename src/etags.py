@@ -0,0 +1,42 @@
+"""
+Strong ETags for the read-mostly catalogue endpoints.
+
+Each table has a change version, kept in the cache backend and bumped after
+every committed insert, update or delete (see cache.py and events.py). A
+response's ETag is derived from the versions of the tables it reads plus the
+request path and query string, so a matching If-None-Match can be answered
+with 304 before the view runs and without touching the database.
+
+With a shared CACHE_URL every worker sees the same versions; with the default
+in-memory backend they are only exact for a single worker.
+"""
+import hashlib
+from functools import wraps
+from flask import request, make_response, Response
+from cache import table_version
+
+
+def compute_etag(tables):
+    parts = [request.full_path, request.headers.get('Accept', '')]
+    parts.extend("{}={}".format(t, table_version(t)) for t in tables)
+    return hashlib.sha1("|".join(parts).encode('utf-8')).hexdigest()
+
+
+def conditional(*tables):
+    """Answer GETs with 304 while none of `tables` changed since the client's ETag."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Read the version before the view runs: a change that lands while
+            # the body is being built then yields an older, never-stale tag.
+            etag = compute_etag(tables)
+            if request.if_none_match.contains(etag):
+                not_modified = Response(status=304)
+                not_modified.set_etag(etag)
+                return not_modified
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,70 @@
+"""
+Change notifications for committed model rows.
+
+Mapper events record which rows a session inserted, updated or deleted; once
+the transaction commits every subscriber is called with `(tablename, ids)`.
+Work that gets rolled back is dropped, so subscribers only ever hear about
+changes that reached the database. This covers the API routes and the
+Flask-Admin ModelViews alike, since both go through `db.session`.
+
+Changes committed by other gunicorn workers arrive through the cache
+backend's invalidation messages (see cache.py) and are replayed here with
+`remote=True`, so process-local state can follow them too.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from models import User, People, Planet, Favorite
+
+_subscribers = []
+
+
+def subscribe(callback=None, local_only=False):
+    """Register `callback(tablename, ids)`; usable as a decorator.
+
+    Callbacks run after the commit, when the session can no longer emit SQL,
+    so they must not query the database. `local_only` callbacks are skipped
+    for changes committed by other processes, which is what shared state
+    (already updated by the committing process) wants.
+    """
+    if callback is None:
+        return lambda fn: subscribe(fn, local_only=local_only)
+    _subscribers.append((callback, local_only))
+    return callback
+
+
+def notify(tablename, ids, remote=False):
+    for callback, local_only in _subscribers:
+        if remote and local_only:
+            continue
+        callback(tablename, ids)
+
+
+def mark_changed(session, tablename, ids):
+    """Record changes made with bulk statements, which skip mapper events."""
+    pending = session.info.setdefault('changed_rows', {})
+    pending.setdefault(tablename, set()).update(ids)
+
+
+def _record(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        mark_changed(session, mapper.local_table.name, (target.id,))
+
+
+for _model in (User, People, Planet, Favorite):
+    for _name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _name, _record)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    changed = session.info.pop('changed_rows', None)
+    if not changed:
+        return
+    for tablename, ids in changed.items():
+        notify(tablename, ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('changed_rows', None)
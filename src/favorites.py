@@ -0,0 +1,302 @@
+"""
+Favorite writes and the per-user favorites list.
+
+Adding or removing a favorite is a single statement: an INSERT that relies on
+the unique (user_id, planet_id) / (user_id, people_id) indexes through ON
+CONFLICT DO NOTHING, or a DELETE ... RETURNING. Databases without those
+(MySQL) get a savepointed INSERT and a locking SELECT before the DELETE.
+
+The per-user list lives in the cache backend under
+`favorites:<user_id>:<version>`. Every committed change to a user's
+favorites bumps the version counter in `favorites_version:<user_id>`, which
+starts at a random value like the table versions in cache.py. A GET reads
+the version before the table, so a list read before a commit can only be
+stored under a version nobody reads any more.
+
+A write reads the cached list at version v before it starts and answers
+with that list plus the rows its INSERT or DELETE returned, with no second
+query. It stores the result under v + 1 only when its own bump returned
+v + 1, i.e. no other write to that user's favorites committed in between;
+otherwise, or when nothing was cached, it reads the table again.
+
+PATCH /users/favorites applies a batch of adds and removes the same way, as
+one bulk DELETE and one multi-row INSERT in a single transaction, after
+checking every id to add with one IN query.
+
+`?expand=1` embeds the people/planet rows, loaded with selectinload in a
+fixed three queries however many favorites the user has. `?fields=` selects
+only the listed Favorite columns (see fields.py) and bypasses the cached list.
+
+These writes are Core statements and skip the ORM mapper events, so they
+record the owner themselves; any other change to a Favorite row
+(Flask-Admin, scripts using the ORM) is picked up by the mapper listeners.
+Either way the owner's version is bumped when the transaction commits.
+"""
+import os
+import json
+import random
+from sqlalchemy import event, inspect, literal, or_, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session, load_only, raiseload, selectinload
+from models import db, Favorite, People, Planet
+from events import mark_changed
+from utils import APIException
+from cache import get_backend, dumps
+from fields import select_fields, field_columns, project
+
+favorite_table = Favorite.__table__
+
+_upsert_inserts = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+BATCH_MAX = int(os.environ.get('FAVORITES_BATCH_MAX', 500))
+BATCH_KINDS = {'people': People, 'planets': Planet}
+
+
+def _version_key(user_id):
+    return "favorites_version:{}".format(user_id)
+
+
+def _list_key(user_id, version):
+    return "favorites:{}:{}".format(user_id, version)
+
+
+def _list_version(user_id):
+    backend = get_backend()
+    key = _version_key(user_id)
+    value = backend.counter(key)
+    if value is None:
+        # Random start, so lists cached under an evicted or reset counter
+        # can never be read again
+        value = backend.incr(key, random.getrandbits(40) + 1)
+    return value
+
+
+def favorites_json(user_id):
+    """The user's favorites as a JSON array, from the cache when possible."""
+    backend = get_backend()
+    # Read the version before the table, see the module docstring
+    key = _list_key(user_id, _list_version(user_id))
+    body = backend.get(key)
+    if body is None:
+        favorites = Favorite.query.filter_by(user_id=user_id).order_by(Favorite.id)
+        body = dumps([f.serialize() for f in favorites])
+        backend.set(key, body)
+    return body
+
+
+def _cached_list(user_id):
+    """`(version, favorites)` before a write; favorites is None when not cached."""
+    version = _list_version(user_id)
+    body = get_backend().get(_list_key(user_id, version))
+    return version, json.loads(body) if body is not None else None
+
+
+def _commit_and_answer(user_id, before, removed=(), added=()):
+    """Commit, then return the new list built from the one read `before` the write."""
+    version, favorites = before
+    db.session.commit()
+    new_version = db.session.info.pop('favorite_versions', {}).get(user_id)
+    if favorites is None or new_version != version + 1:
+        return favorites_json(user_id)
+    changed = set(removed) | {f["id"] for f in added}
+    favorites = sorted([f for f in favorites if f["id"] not in changed] + list(added), key=lambda f: f["id"])
+    body = dumps(favorites)
+    get_backend().set(_list_key(user_id, new_version), body)
+    return body
+
+
+def projected_favorites_json(user_id, fields):
+    """The user's favorites with only `fields`, from one column query."""
+    favorites = select_fields(Favorite, fields).filter(Favorite.user_id == user_id).order_by(Favorite.id)
+    return dumps([project(f, fields) for f in favorites])
+
+
+def expanded_favorites_json(user_id, fields=None):
+    """The user's favorites with the favorited people/planet embedded."""
+    options = [selectinload(Favorite.people), selectinload(Favorite.planet), raiseload('*')]
+    if fields:
+        # The foreign keys are needed to match the selectinloaded rows
+        options.append(load_only(*field_columns(Favorite, fields, ['people_id', 'planet_id'])))
+    favorites = Favorite.query.filter_by(user_id=user_id).options(*options).order_by(Favorite.id)
+    if not fields:
+        return dumps([f.serialize_expanded() for f in favorites])
+    return dumps([dict(project(f, fields),
+                       people=f.people.serialize() if f.people else None,
+                       planet=f.planet.serialize() if f.planet else None) for f in favorites])
+
+
+def _mark_owner(user_id):
+    """Bump `user_id`'s list version when the current transaction commits."""
+    db.session.info.setdefault('favorite_owners', set()).add(user_id)
+
+
+def _match(user_id, people_id, planet_id):
+    if planet_id is not None:
+        return favorite_table.c.user_id == user_id, favorite_table.c.planet_id == planet_id
+    return favorite_table.c.user_id == user_id, favorite_table.c.people_id == people_id
+
+
+def _conflict_columns(people_id, planet_id):
+    return ['user_id', 'planet_id'] if planet_id is not None else ['user_id', 'people_id']
+
+
+def _insert_favorite(values, conflict_columns):
+    """INSERT relying on the unique index; returns the new id, or None on a duplicate."""
+    insert = _upsert_inserts.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        stmt = (insert(favorite_table).values(**values)
+                .on_conflict_do_nothing(index_elements=conflict_columns)
+                .returning(favorite_table.c.id))
+        return db.session.execute(stmt).scalar()
+    try:
+        with db.session.begin_nested():
+            result = db.session.execute(favorite_table.insert().values(**values))
+    except IntegrityError:
+        return None
+    return result.inserted_primary_key[0]
+
+
+def _delete_favorites(*where):
+    """DELETE the matching favorites; returns the ids of the rows removed."""
+    if db.session.get_bind().dialect.delete_returning:
+        stmt = favorite_table.delete().where(*where).returning(favorite_table.c.id)
+        return set(db.session.execute(stmt).scalars())
+    # No RETURNING (MySQL): lock the rows first, so the ids read are the ones deleted
+    ids = set(db.session.execute(select(favorite_table.c.id).where(*where).with_for_update()).scalars())
+    if ids:
+        db.session.execute(favorite_table.delete().where(favorite_table.c.id.in_(ids)))
+    return ids
+
+
+def add_favorite(user_id, people_id=None, planet_id=None):
+    """Add a favorite; returns the new list as JSON, or None if it already existed."""
+    values = {"user_id": int(user_id), "people_id": people_id, "planet_id": planet_id}
+    before = _cached_list(values["user_id"])
+    new_id = _insert_favorite(values, _conflict_columns(people_id, planet_id))
+    if new_id is None:
+        db.session.rollback()
+        return None
+    mark_changed(db.session, Favorite.__tablename__, (new_id,))
+    _mark_owner(values["user_id"])
+    return _commit_and_answer(values["user_id"], before, added=[Favorite(id=new_id, **values).serialize()])
+
+
+def remove_favorite(user_id, people_id=None, planet_id=None):
+    """Remove a favorite; returns the new list as JSON, or None if there was none."""
+    user_id = int(user_id)
+    before = _cached_list(user_id)
+    removed = _delete_favorites(*_match(user_id, people_id, planet_id))
+    if not removed:
+        db.session.rollback()
+        return None
+    mark_changed(db.session, Favorite.__tablename__, removed)
+    _mark_owner(user_id)
+    return _commit_and_answer(user_id, before, removed=removed)
+
+
+def parse_batch(data):
+    """Validate `{"add": {"people": [...], "planets": [...]}, "remove": {...}}`.
+
+    Returns `{(op, kind): sorted ids}` for every op/kind pair.
+    """
+    if not isinstance(data, dict):
+        raise APIException("Expected a JSON object", status_code=400)
+    batch = {}
+    for op in ('add', 'remove'):
+        section = data.get(op) or {}
+        if not isinstance(section, dict):
+            raise APIException("'{}' must be an object".format(op), status_code=400)
+        for kind in BATCH_KINDS:
+            ids = section.get(kind) or []
+            if not isinstance(ids, list) or not all(type(i) is int for i in ids):
+                raise APIException("'{}.{}' must be a list of ids".format(op, kind), status_code=400)
+            batch[op, kind] = sorted(set(ids))
+    total = sum(len(ids) for ids in batch.values())
+    if total == 0:
+        raise APIException("Empty batch", status_code=400)
+    if total > BATCH_MAX:
+        raise APIException("At most {} operations per batch".format(BATCH_MAX), status_code=400)
+    return batch
+
+
+def missing_entities(batch):
+    """Ids the batch wants to add that do not exist, checked with one query."""
+    queries = [select(literal(kind), model.id).where(model.id.in_(batch['add', kind]))
+               for kind, model in BATCH_KINDS.items() if batch['add', kind]]
+    if not queries:
+        return {}
+    stmt = queries[0] if len(queries) == 1 else union_all(*queries)
+    found = {tuple(row) for row in db.session.execute(stmt)}
+    missing = {}
+    for kind in BATCH_KINDS:
+        absent = [i for i in batch['add', kind] if (kind, i) not in found]
+        if absent:
+            missing[kind] = absent
+    return missing
+
+
+def _bulk_insert(user_id, rows):
+    """Insert `rows`, skipping existing favorites; returns the inserted rows serialized."""
+    insert = _upsert_inserts.get(db.session.get_bind().dialect.name)
+    if insert is None:
+        inserted = []
+        for values in rows:
+            new_id = _insert_favorite(values, _conflict_columns(values["people_id"], values["planet_id"]))
+            if new_id is not None:
+                inserted.append(Favorite(id=new_id, **values).serialize())
+        return inserted
+    stmt = (insert(favorite_table).values(rows).on_conflict_do_nothing()
+            .returning(favorite_table.c.id, favorite_table.c.people_id, favorite_table.c.planet_id))
+    return [Favorite(id=r.id, user_id=user_id, people_id=r.people_id, planet_id=r.planet_id).serialize()
+            for r in db.session.execute(stmt)]
+
+
+def apply_batch(user_id, batch):
+    """Apply a parsed batch in one transaction, removes first; returns the new list as JSON."""
+    user_id = int(user_id)
+    before = _cached_list(user_id)
+    removed = set()
+    targets = [column.in_(batch['remove', kind]) for kind, column in
+               (('people', favorite_table.c.people_id), ('planets', favorite_table.c.planet_id))
+               if batch['remove', kind]]
+    if targets:
+        removed = _delete_favorites(favorite_table.c.user_id == user_id, or_(*targets))
+
+    rows = [{"user_id": user_id, "people_id": i, "planet_id": None} for i in batch['add', 'people']]
+    rows += [{"user_id": user_id, "people_id": None, "planet_id": i} for i in batch['add', 'planets']]
+    added = _bulk_insert(user_id, rows) if rows else []
+
+    mark_changed(db.session, Favorite.__tablename__, removed | {f["id"] for f in added})
+    _mark_owner(user_id)
+    return _commit_and_answer(user_id, before, removed=removed, added=added)
+
+
+def _record_owner(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        return
+    owners = session.info.setdefault('favorite_owners', set())
+    owners.add(target.user_id)
+    # A row moved to another user leaves the previous owner's list stale too
+    owners.update(inspect(target).attrs.user_id.history.deleted or ())
+
+
+for _name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Favorite, _name, _record_owner)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_owner_versions(session):
+    owners = session.info.pop('favorite_owners', None)
+    if owners:
+        backend = get_backend()
+        versions = session.info.setdefault('favorite_versions', {})
+        for user_id in owners:
+            _list_version(user_id)
+            versions[user_id] = backend.incr(_version_key(user_id))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_owners(session):
+    session.info.pop('favorite_owners', None)
@@ -0,0 +1,60 @@
+"""
+Sparse fieldsets: `?fields=name,gender` on the list and detail routes.
+
+Only the requested columns are selected, as plain column rows, so neither
+the unused columns nor the ORM objects are loaded, and only those keys are
+encoded. `id` is always included, since it is what clients key rows on and
+what the list cursors are built from.
+
+Projected responses skip the entity cache, which holds whole rows; they are
+already the cheap path. Requests without `fields` are unchanged.
+"""
+from flask import request
+from models import db, User, People, Planet, Favorite
+from utils import APIException
+from cache import dumps
+
+# The keys serialize() emits, in the same order
+SERIALIZED = {
+    User: ('id', 'email'),
+    People: ('id', 'name', 'birth_year', 'gender'),
+    Planet: ('id', 'name', 'climate', 'terrain'),
+    Favorite: ('id', 'user_id', 'people_id', 'planet_id'),
+}
+
+
+def fields_arg(model):
+    """The fields requested for `model`, or None when the whole row is wanted."""
+    raw = request.args.get('fields')
+    if raw is None:
+        return None
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    allowed = SERIALIZED[model]
+    if not names or any(name not in allowed for name in names):
+        raise APIException("fields must be a comma separated list of: {}".format(', '.join(allowed)),
+                           status_code=400)
+    return ['id'] + [name for name in dict.fromkeys(names) if name != 'id']
+
+
+def field_columns(model, fields, extra=()):
+    """Columns to select for `fields`, plus `extra` ones needed for ordering."""
+    return [getattr(model, name) for name in dict.fromkeys(list(fields) + list(extra))]
+
+
+def select_fields(model, fields, extra=()):
+    return db.session.query(*field_columns(model, fields, extra))
+
+
+def project(row, fields):
+    return {name: getattr(row, name) for name in fields}
+
+
+def encode_fields(rows, fields):
+    """`{id: json_bytes}` of the projected rows, in order."""
+    return {row.id: dumps(project(row, fields)) for row in rows}
+
+
+def get_fields(model, entity_id, fields):
+    """The projected JSON of `model` row `entity_id`, or None."""
+    row = select_fields(model, fields).filter(model.id == entity_id).first()
+    return dumps(project(row, fields)) if row is not None else None
@@ -0,0 +1,72 @@
+"""
+Resolve the user behind a JWT without a query on every protected request.
+
+The JWT `sub` is the user id as a string. routes.py registers
+`resolve_identity` as the user lookup, so a token is refused (401) once its
+user is deleted or deactivated. The lookup selects only id, email and
+is_active, and keeps the result in a small per-process LRU for
+IDENTITY_CACHE_TTL seconds (default 30), negative results included.
+
+Any committed change to the `user` table drops the affected entries: through
+events.notify in this process, and through the cache backend's invalidation
+messages in the other workers. The TTL bounds staleness when the backend
+cannot broadcast (memory://), for example after an edit from another host.
+"""
+import os
+import threading
+from collections import namedtuple
+from sqlalchemy import select
+from cache import LRUCache
+from events import subscribe
+from models import db, User
+
+IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 30))
+IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 10000))
+
+CurrentUser = namedtuple('CurrentUser', 'id email is_active')
+
+_identities = LRUCache(IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL)
+_generation = 0
+_lock = threading.Lock()
+
+
+def _load(user_id):
+    row = db.session.execute(
+        select(User.id, User.email, User.is_active).where(User.id == user_id)).first()
+    return CurrentUser(*row) if row else None
+
+
+def resolve_identity(sub):
+    """Return the CurrentUser for a token subject, or None if it may not log in."""
+    try:
+        user_id = int(sub)
+    except (TypeError, ValueError):
+        return None
+    cached = _identities.get(user_id)
+    if cached is None:
+        generation = _generation
+        user = _load(user_id)
+        # False marks unknown users, so replayed tokens do not query either
+        cached = user or False
+        with _lock:
+            # Skip the store if a change to the user table committed meanwhile
+            if generation == _generation:
+                _identities.set(user_id, cached)
+    if not cached or not cached.is_active:
+        return None
+    return cached
+
+
+@subscribe
+def _forget(tablename, ids):
+    global _generation
+    if tablename != User.__tablename__:
+        return
+    with _lock:
+        _generation += 1
+        for user_id in ids:
+            _identities.delete(user_id)
+
+
+def stats():
+    return _identities.stats()
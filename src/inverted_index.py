@@ -0,0 +1,96 @@
+"""
+An in-process inverted index with prefix matching, standard library only.
+
+Documents are sets of weighted fields; every word of a field is posted under
+the document id with the field's weight. A query matches the documents that
+contain, for every query word, some word starting with it, and ranks them by
+the weights found times the rarity (idf) of each query word.
+"""
+import re
+import math
+import heapq
+import threading
+from bisect import bisect_left, insort
+
+WORD = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return WORD.findall(text.lower()) if text else []
+
+
+class InvertedIndex:
+    def __init__(self):
+        self.postings = {}
+        self.documents = {}
+        # Sorted words, so a prefix maps to one contiguous slice
+        self.vocabulary = []
+        self.lock = threading.RLock()
+
+    def add(self, doc_id, fields):
+        """Index `doc_id` from `[(text, weight), ...]`, replacing what it had."""
+        terms = {}
+        for text, weight in fields:
+            for word in tokenize(text):
+                terms[word] = terms.get(word, 0) + weight
+        with self.lock:
+            self.remove(doc_id)
+            for word, weight in terms.items():
+                posting = self.postings.get(word)
+                if posting is None:
+                    posting = self.postings[word] = {}
+                    insort(self.vocabulary, word)
+                posting[doc_id] = weight
+            self.documents[doc_id] = tuple(terms)
+
+    def remove(self, doc_id):
+        with self.lock:
+            for word in self.documents.pop(doc_id, ()):
+                posting = self.postings[word]
+                del posting[doc_id]
+                if not posting:
+                    del self.postings[word]
+                    del self.vocabulary[bisect_left(self.vocabulary, word)]
+
+    def expand(self, prefix):
+        """Words of the vocabulary starting with `prefix`."""
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + '\U0010ffff', start)
+        return self.vocabulary[start:end]
+
+    def search(self, words, limit):
+        """Return up to `limit` `(score, doc_id)` pairs, best first."""
+        with self.lock:
+            total = len(self.documents)
+            # (matching documents, postings) per word, rarest word first
+            terms = []
+            for word in words:
+                postings = [self.postings[w] for w in self.expand(word)]
+                terms.append((sum(len(p) for p in postings), postings))
+            terms.sort(key=lambda term: term[0])
+            if not terms or not terms[0][0]:
+                return []
+            scores = None
+            for size, postings in terms:
+                idf = math.log(1 + total / size)
+                if scores is None:
+                    scores = {}
+                    for posting in postings:
+                        for doc_id, weight in posting.items():
+                            scores[doc_id] = max(scores.get(doc_id, 0), weight * idf)
+                    continue
+                # Every word must match: probe the postings for the candidates
+                # left instead of walking all documents with a common word
+                narrowed = {}
+                for doc_id, score in scores.items():
+                    weight = max((p.get(doc_id, 0) for p in postings), default=0)
+                    if weight:
+                        narrowed[doc_id] = score + weight * idf
+                scores = narrowed
+                if not scores:
+                    return []
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(score, doc_id) for doc_id, score in best]
+
+    def __len__(self):
+        return len(self.documents)
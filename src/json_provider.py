@@ -0,0 +1,100 @@
+"""
+JSON provider backed by the fastest encoder installed.
+
+JSON_ENCODER picks it: `auto` (default) tries orjson, then msgspec, then the
+standard library; naming one forces it and fails loudly if it is missing.
+Anything the fast encoders cannot handle falls back to Flask's default
+provider, so responses look the same whichever encoder is active.
+"""
+import os
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _orjson_encoder(default, sort_keys):
+    # Datetimes go through `default` to keep Flask's HTTP-date format
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return lambda obj: orjson.dumps(obj, default=default, option=option)
+
+
+def _msgspec_encoder(default, sort_keys):
+    encoder = msgspec.json.Encoder(enc_hook=default, order='sorted' if sort_keys else None)
+    return encoder.encode
+
+
+def _stdlib_encoder(default, sort_keys):
+    encoder = json.JSONEncoder(default=default, sort_keys=sort_keys, separators=(',', ':'))
+    return lambda obj: encoder.encode(obj).encode('utf-8')
+
+
+def _msgspec_loads(s):
+    # msgspec.DecodeError is not a ValueError, which is what Werkzeug's
+    # get_json() turns into a 400 (orjson's JSONDecodeError already is one)
+    try:
+        return msgspec.json.decode(s)
+    except msgspec.DecodeError as error:
+        raise ValueError(str(error)) from error
+
+
+ENCODERS = {
+    'orjson': (lambda: orjson is not None, _orjson_encoder, lambda s: orjson.loads(s)),
+    'msgspec': (lambda: msgspec is not None, _msgspec_encoder, _msgspec_loads),
+    'stdlib': (lambda: True, _stdlib_encoder, json.loads),
+}
+
+
+def select_encoder(name=None):
+    name = name or os.environ.get('JSON_ENCODER', 'auto')
+    if name == 'auto':
+        return next(n for n, (available, _, _) in ENCODERS.items() if available())
+    if name not in ENCODERS:
+        raise ValueError("Unknown JSON_ENCODER: {}".format(name))
+    if not ENCODERS[name][0]():
+        raise RuntimeError("JSON_ENCODER={} but the package is not installed".format(name))
+    return name
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    # Fragments are concatenated into responses, so keep key order stable
+    # but skip the sort: serialize() already emits a fixed order.
+    sort_keys = False
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.encoder_name = select_encoder()
+        _, make_encoder, self._fast_loads = ENCODERS[self.encoder_name]
+        self._encode = make_encoder(self.default, self.sort_keys)
+
+    def dumps_bytes(self, obj):
+        try:
+            return self._encode(obj)
+        except TypeError:
+            return super().dumps(obj).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return self._fast_loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(obj)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
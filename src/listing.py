@@ -0,0 +1,113 @@
+"""
+Filters and sort order for the people and planets list endpoints.
+
+    /api/people?gender=female&gender=hermaphrodite&sort=-birth_year&limit=20
+    /api/planets?climate=arid&name=oo&sort=name
+
+Only whitelisted columns can be used, and each has a `(column, id)` index
+from the list_indexes migration. The same index serves an equality filter,
+which keeps the id keyset order, and a sort on that column, walked in
+either direction with the id as tie-breaker. Repeat a filter to match any
+of several values (climates such as "arid, temperate" contain commas).
+
+The sortable columns other than `id` are nullable. NULLs sort after every
+value, so last ascending and first descending, which is how Postgres walks
+the same index; cursors carry `[null, id]` once the page reaches them.
+`name` is a case-insensitive substring match, which no B-tree index can
+serve; /api/search is the indexed alternative.
+"""
+import json
+from flask import request
+from sqlalchemy import and_, or_, tuple_
+from models import db, People, Planet
+from utils import APIException
+
+FILTERS = {
+    People: ('gender', 'birth_year'),
+    Planet: ('climate', 'terrain'),
+}
+SORTS = {
+    People: ('id', 'name', 'birth_year', 'gender'),
+    Planet: ('id', 'name', 'climate', 'terrain'),
+}
+CONTAINS = 'name'
+MAX_FILTER_VALUES = 20
+
+
+class Listing:
+    def __init__(self, model, filters=None, contains=None, sort='id', descending=False):
+        self.model = model
+        self.filters = filters or {}
+        self.contains = contains
+        self.sort = sort
+        self.descending = descending
+
+    @property
+    def key(self):
+        """Canonical form, for cache keys; empty for the default listing.
+
+        JSON, so a value containing a comma cannot read as two values.
+        """
+        if not (self.filters or self.contains or self.sort != 'id' or self.descending):
+            return ''
+        return json.dumps([sorted(self.filters.items()), self.contains, self.sort, self.descending],
+                          separators=(',', ':'))
+
+    def apply(self, stmt):
+        """Add the filters and the sort order to a Query or Select."""
+        for name, values in self.filters.items():
+            column = getattr(self.model, name)
+            stmt = stmt.where(column == values[0] if len(values) == 1 else column.in_(values))
+        if self.contains:
+            escaped = self.contains.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            stmt = stmt.where(getattr(self.model, CONTAINS).ilike('%' + escaped + '%', escape='\\'))
+        if self.sort == 'id':
+            return stmt.order_by(self.model.id.desc() if self.descending else self.model.id)
+        column, pk = getattr(self.model, self.sort), self.model.id
+        keys = [column.desc().nulls_first(), pk.desc()] if self.descending else [column.nulls_last(), pk]
+        if db.session.get_bind().dialect.name == 'mysql':
+            # MySQL has no NULLS FIRST/LAST; sort on the NULL test first
+            null = column.is_(None)
+            keys = [null.desc(), column.desc(), pk.desc()] if self.descending else [null, column, pk]
+        return stmt.order_by(*keys)
+
+    def after(self, value):
+        """The keyset condition for rows past cursor `value`."""
+        if self.sort == 'id':
+            return self.model.id < value if self.descending else self.model.id > value
+        column, pk = getattr(self.model, self.sort), self.model.id
+        sort_value, entity_id = value
+        if sort_value is None:
+            # Past a NULL: the rest of the NULLs, then (descending) every value
+            nulls = and_(column.is_(None), pk < entity_id if self.descending else pk > entity_id)
+            return or_(nulls, column.isnot(None)) if self.descending else nulls
+        left, right = tuple_(column, pk), tuple_(sort_value, entity_id)
+        if self.descending:
+            return left < right
+        return or_(left > right, column.is_(None))
+
+    def cursor_value(self, row):
+        if self.sort == 'id':
+            return row.id
+        return [getattr(row, self.sort), row.id]
+
+
+def listing_args(model):
+    """Read the filter and sort arguments of the current request."""
+    filters = {}
+    for name in FILTERS.get(model, ()):
+        if name in request.args:
+            values = [v.strip() for v in request.args.getlist(name) if v.strip()]
+            if not values or len(values) > MAX_FILTER_VALUES:
+                raise APIException("{} takes 1 to {} values".format(name, MAX_FILTER_VALUES), status_code=400)
+            filters[name] = sorted(set(values))
+    contains = request.args.get(CONTAINS, '').strip() or None
+
+    sort = request.args.get('sort', 'id')
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    if sort not in SORTS.get(model, ('id',)):
+        raise APIException("sort must be one of: {}".format(', '.join(SORTS.get(model, ('id',)))),
+                           status_code=400)
+    return Listing(model, filters, contains, sort, descending)
+
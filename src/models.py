@@ -7,7 +7,8 @@ db = SQLAlchemy()
 class User(db.Model):
     id: Mapped[int] = mapped_column(primary_key=True)
     email: Mapped[str] = mapped_column(String(120), unique=True, nullable=False)
-    password: Mapped[str] = mapped_column(nullable=False)
+    # Werkzeug hash, see passwords.py
+    password: Mapped[str] = mapped_column(String(255), nullable=False)
     is_active: Mapped[bool] = mapped_column(nullable=False)
 
     def serialize(self):
@@ -18,6 +19,12 @@ class User(db.Model):
 
 class People(db.Model):
     __tablename__ = 'people'
+    # (column, id) indexes for the list filters and sorts, see listing.py
+    __table_args__ = (
+        db.Index('ix_people_name_id', 'name', 'id'),
+        db.Index('ix_people_gender_id', 'gender', 'id'),
+        db.Index('ix_people_birth_year_id', 'birth_year', 'id'),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
     birth_year: Mapped[str] = mapped_column(String(120))
@@ -33,6 +40,12 @@ class People(db.Model):
 
 class Planet(db.Model):
     __tablename__ = 'planet'
+    # (column, id) indexes for the list filters and sorts, see listing.py
+    __table_args__ = (
+        db.Index('ix_planet_name_id', 'name', 'id'),
+        db.Index('ix_planet_climate_id', 'climate', 'id'),
+        db.Index('ix_planet_terrain_id', 'terrain', 'id'),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
     climate: Mapped[str] = mapped_column(String(120))
@@ -48,6 +61,12 @@ class Planet(db.Model):
 
 class Favorite(db.Model):
     __tablename__ = 'favorite'
+    # NULLs never collide, so a people favorite does not clash on the planet
+    # index and vice versa. The user_id prefix also serves per-user lookups.
+    __table_args__ = (
+        db.Index('ix_favorite_user_planet', 'user_id', 'planet_id', unique=True),
+        db.Index('ix_favorite_user_people', 'user_id', 'people_id', unique=True),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(db.ForeignKey('user.id'), nullable=False)
     people_id: Mapped[int] = mapped_column(db.ForeignKey('people.id'), nullable=True)
@@ -64,3 +83,17 @@ class Favorite(db.Model):
             "people_id": self.people_id,
             "planet_id": self.planet_id,
         }
+
+    def serialize_expanded(self):
+        data = self.serialize()
+        data["people"] = self.people.serialize() if self.people else None
+        data["planet"] = self.planet.serialize() if self.planet else None
+        return data
+
+class RevokedToken(db.Model):
+    """JWTs revoked before expiry; see revocation.py."""
+    __tablename__ = 'revoked_token'
+    jti: Mapped[str] = mapped_column(String(36), primary_key=True)
+    # Token expiry and revocation time, as Unix timestamps
+    expires: Mapped[int] = mapped_column(nullable=True, index=True)
+    revoked_at: Mapped[float] = mapped_column(nullable=False, index=True)
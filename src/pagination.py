@@ -0,0 +1,179 @@
+"""
+Keyset (cursor) pagination helpers for the list endpoints.
+
+Pages are fetched with `WHERE id > :after ORDER BY id LIMIT :limit`, which the
+primary key index answers in constant time no matter how deep the client is
+into the table. Cursors are opaque to clients so the key can change later:
+with `?sort=` (see listing.py) they carry the sort value and the id.
+
+Pages are cached as id lists keyed on the table version and their rows are
+served as pre-encoded fragments from the entity cache, so a repeated page
+costs no SQL and no per-row serialization.
+"""
+import os
+import json
+import base64
+import binascii
+from flask import request
+from utils import APIException, join_fragments, fragment_response
+from streaming import wants_stream, stream_response
+from cache import get_backend, get_fragments, store_fragments, encode_rows, table_version, dumps
+from listing import Listing, listing_args
+from fields import fields_arg, select_fields, encode_fields
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('API_DEFAULT_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 500))
+
+# Hard cap for the legacy, unpaginated form of the list endpoints
+MAX_LIST_ROWS = int(os.environ.get('API_MAX_LIST_ROWS', 1000))
+
+
+def encode_cursor(value, sort='id'):
+    if sort == 'id':
+        raw = "id:{}".format(value).encode('ascii')
+    else:
+        raw = "{}:{}".format(sort, json.dumps(value)).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort='id'):
+    """Return the id, or the `[sort value, id]` pair, stored in `cursor`."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        prefix, value = raw.split(':', 1)
+        if prefix != sort:
+            raise ValueError(prefix)
+        if sort == 'id':
+            return int(value)
+        value = json.loads(value)
+        # The sort columns are nullable, so the value can be null
+        if not (isinstance(value, list) and len(value) == 2 and isinstance(value[0], (str, type(None)))
+                and isinstance(value[1], int)):
+            raise ValueError(value)
+        return value
+    except (ValueError, UnicodeError, binascii.Error):
+        raise APIException("Invalid cursor", status_code=400)
+
+
+def wants_pagination():
+    return 'limit' in request.args or 'after' in request.args
+
+
+def page_args(sort='id'):
+    """Read and validate `?limit=&after=` from the current request."""
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise APIException("limit must be an integer", status_code=400)
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise APIException("limit must be between 1 and {}".format(MAX_PAGE_SIZE), status_code=400)
+    after = request.args.get('after')
+    return limit, decode_cursor(after, sort) if after else None
+
+
+def keyset_page(query, model, limit, after=None, listing=None):
+    """Return `(rows, next_cursor)` for one page of `query` in `listing` order.
+
+    One extra row is fetched to know whether another page exists, so the last
+    page never hands out a cursor that leads to an empty response.
+    """
+    listing = listing or Listing(model)
+    query = listing.apply(query)
+    if after is not None:
+        query = query.filter(listing.after(after))
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(listing.cursor_value(rows[-1]), listing.sort)
+    return rows, None
+
+
+def cached_page(model, limit, after=None, listing=None):
+    """Like keyset_page, but returns encoded row fragments and goes through the cache."""
+    listing = listing or Listing(model)
+    tablename = model.__tablename__
+    version = table_version(tablename)
+    key = "page:{}:{}:{}:{}".format(tablename, version, limit, json.dumps(after) if after else 0)
+    if listing.key:
+        key += ":" + listing.key
+    backend = get_backend()
+    cached = backend.get(key)
+    if cached is not None:
+        page = json.loads(cached)
+        return get_fragments(model, page["ids"]), page["next"]
+
+    rows, next_cursor = keyset_page(model.query, model, limit, after, listing)
+    fragments = encode_rows(rows)
+    store_fragments(tablename, fragments, version)
+    backend.set(key, dumps({"ids": list(fragments), "next": next_cursor}))
+    return list(fragments.values()), next_cursor
+
+
+def projected_page(model, fields, limit, after=None, listing=None):
+    """Like keyset_page, but selects only `fields` (see fields.py) and returns encoded rows."""
+    listing = listing or Listing(model)
+    query = select_fields(model, fields, extra=[listing.sort])
+    rows, next_cursor = keyset_page(query, model, limit, after, listing)
+    return list(encode_fields(rows, fields).values()), next_cursor
+
+
+def page_fragments(model, limit, after=None, listing=None, fields=None):
+    if fields:
+        return projected_page(model, fields, limit, after, listing)
+    return cached_page(model, limit, after, listing)
+
+
+def ids_arg(name='ids'):
+    """Parse a `?ids=1,2,3` style argument, keeping order and duplicates."""
+    try:
+        ids = [int(i) for i in request.args.get(name, '').split(',') if i.strip()]
+    except ValueError:
+        raise APIException("{} must be a comma separated list of ids".format(name), status_code=400)
+    if len(ids) > MAX_PAGE_SIZE:
+        raise APIException("At most {} ids per request".format(MAX_PAGE_SIZE), status_code=400)
+    return ids
+
+
+def multi_get_body(model, ids, fields=None):
+    """JSON array of `model` rows in `ids` order, with a marker for unknown ids.
+
+    Cached fragments are used first and the rest come from a single IN query.
+    With `fields` only those columns are selected, in one IN query.
+    """
+    unique = list(dict.fromkeys(ids))
+    if fields:
+        by_id = encode_fields(select_fields(model, fields).filter(model.id.in_(unique)), fields)
+        by_id = {i: by_id.get(i) for i in unique}
+    else:
+        by_id = dict(zip(unique, get_fragments(model, unique)))
+    return join_fragments(by_id[i] or dumps({"id": i, "error": "not found"}) for i in ids)
+
+
+def list_response(model):
+    """Serialize `model` rows for a list endpoint.
+
+    With `?limit=` or `?after=` the body is `{"results": [...], "next": cursor}`.
+    Without them the legacy bare list is returned, capped at MAX_LIST_ROWS; when
+    rows were left out the `X-Next-Cursor` header tells the client where to
+    continue in cursor mode. Streaming requests (see streaming.py) bypass both
+    and get every row as NDJSON. `?ids=` returns just those rows, in order.
+    Filters and `?sort=` (see listing.py) apply to every mode but `?ids=`, and
+    `?fields=` (see fields.py) to all of them.
+    """
+    fields = fields_arg(model)
+    if 'ids' in request.args:
+        return fragment_response(multi_get_body(model, ids_arg(), fields))
+    listing = listing_args(model)
+    if wants_stream():
+        return stream_response(model, listing, fields)
+    if wants_pagination():
+        limit, after = page_args(listing.sort)
+        fragments, next_cursor = page_fragments(model, limit, after, listing, fields)
+        body = b'{"results":' + join_fragments(fragments) + b',"next":' + dumps(next_cursor) + b'}'
+        return fragment_response(body)
+
+    fragments, next_cursor = page_fragments(model, MAX_LIST_ROWS, listing=listing, fields=fields)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return fragment_response(join_fragments(fragments), headers=headers)
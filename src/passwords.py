@@ -0,0 +1,104 @@
+"""
+Password hashing with a tunable cost, run in a bounded worker pool.
+
+PASSWORD_HASH_METHOD takes any Werkzeug method string, e.g. the default
+`scrypt:32768:8:1` or `pbkdf2:sha256:600000`; raise the numbers to make each
+hash more expensive. Stored hashes made with other parameters, and plain
+text passwords from before hashing, are replaced on the next successful
+login.
+
+Hashing is CPU-bound by design. It runs on a thread pool of
+PASSWORD_HASH_WORKERS threads per process (default 2). hashlib releases the
+GIL while it works, so the pools of all workers together can use every core
+while the number of hashes in flight stays bounded. gunicorn.conf.py sets the
+default to the usable CPUs divided among its workers. At most PASSWORD_HASH_QUEUE requests may wait for a
+slot. Beyond that, or after PASSWORD_HASH_TIMEOUT seconds, the request gets a
+503 instead of piling up behind a credential-stuffing burst. A timed out hash
+is cancelled if it has not started, and keeps its slot until it ends if it has.
+"""
+import os
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+from utils import APIException
+
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', HASH_WORKERS * 4))
+HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+HASH_PREFIXES = ('scrypt:', 'pbkdf2:')
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE)
+_current_prefix = None
+_dummy_hash = None
+
+
+def _executor():
+    # Threads do not survive fork(): every gunicorn worker builds its own pool
+    global _pool, _pool_pid
+    if _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool_pid != os.getpid():
+                _pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='password-hash')
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def run_bounded(fn, *args):
+    """Run `fn(*args)` on the hashing pool and wait for it, or fail with 503."""
+    if not _slots.acquire(blocking=False):
+        raise APIException("Too many concurrent logins, try again shortly", status_code=503)
+    try:
+        future = _executor().submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    # The slot is held until the hash is finished or cancelled, not just until
+    # the caller gives up waiting, so timed out work still counts against the bound
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()
+        raise APIException("Too many concurrent logins, try again shortly", status_code=503)
+
+
+def is_hashed(stored):
+    return stored.startswith(HASH_PREFIXES) and stored.count('$') == 2
+
+
+def hash_password(password):
+    return run_bounded(generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+
+def _verify(stored, password):
+    if is_hashed(stored):
+        return check_password_hash(stored, password)
+    # Row not migrated yet: plain text, compared in constant time
+    return hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8'))
+
+
+def verify_password(stored, password):
+    return run_bounded(_verify, stored, password)
+
+
+def burn_verify(password):
+    """Spend the time of a real check, so unknown emails cannot be told apart by latency."""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = generate_password_hash('dummy password', PASSWORD_HASH_METHOD)
+    run_bounded(check_password_hash, _dummy_hash, password)
+
+
+def needs_rehash(stored):
+    global _current_prefix
+    if not is_hashed(stored):
+        return True
+    if _current_prefix is None:
+        # Werkzeug expands short forms ("scrypt") into full parameters
+        _current_prefix = generate_password_hash('', PASSWORD_HASH_METHOD).split('$', 1)[0]
+    return stored.split('$', 1)[0] != _current_prefix
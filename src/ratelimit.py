@@ -0,0 +1,105 @@
+"""
+Sliding-window rate limits for /login and /signup.
+
+Each limit counts hits per key (client IP or email) in fixed windows stored
+as expiring counters in the cache backend: per process with
+CACHE_URL=memory://, shared by every gunicorn worker with a file:// or
+redis:// backend. The sliding estimate weights the previous window by how
+much of it still overlaps the last `window` seconds, which keeps two
+counters per key instead of a timestamp per request.
+
+Limits are "<requests>/<seconds>" strings, e.g. LOGIN_RATE_LIMIT_IP=20/60;
+an empty value disables that limit. Checks run before the view touches the
+database, so a credential-stuffing burst costs one counter increment per
+request.
+"""
+import os
+import time
+import hashlib
+from functools import wraps
+from flask import request, jsonify
+from cache import get_backend
+
+
+def parse_limit(value):
+    if not value:
+        return None
+    count, seconds = value.split('/', 1)
+    return int(count), float(seconds)
+
+
+class SlidingWindowLimiter:
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit, self.window = limit
+
+    def _key(self, key, index):
+        return 'rl:{}:{}:{}'.format(self.name, key, index)
+
+    def hit(self, key):
+        """Count one request for `key`; return (allowed, retry_after_seconds)."""
+        backend = get_backend()
+        now = time.time()
+        index, offset = divmod(now, self.window)
+        index = int(index)
+        ttl = int(self.window * 2) + 1
+        current = backend.incr(self._key(key, index), ttl=ttl)
+        previous = backend.counter(self._key(key, index - 1)) or 0
+        estimate = previous * (1 - offset / self.window) + current
+        if estimate <= self.limit:
+            return True, 0
+        # Rejected hits are counted too, so hammering keeps the key blocked
+        if current > self.limit:
+            retry = self.window - offset
+        else:
+            # Time until the previous window's weight has decayed enough to fit
+            retry = self.window * (1 - (self.limit - current) / previous) - offset
+        return False, int(max(retry, 0)) + 1
+
+
+def client_ip():
+    # request.remote_addr honours ProxyFix when TRUSTED_PROXIES is set
+    return request.remote_addr or 'unknown'
+
+
+def email_key(email):
+    # Hash so raw addresses never end up in the shared cache
+    return hashlib.sha1(email.strip().lower().encode('utf-8')).hexdigest()
+
+
+def rate_limited(name, by_ip=None, by_email=None):
+    """Reject a JSON POST with 429 once any of its limits is exceeded."""
+    limiters = []
+    if parse_limit(by_ip):
+        limiters.append((SlidingWindowLimiter(name + ':ip', parse_limit(by_ip)), lambda data: client_ip()))
+    if parse_limit(by_email):
+        limiters.append((SlidingWindowLimiter(name + ':email', parse_limit(by_email)),
+                         lambda data: email_key(data['email']) if isinstance(data.get('email'), str) else None))
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            data = request.get_json(silent=True)
+            data = data if isinstance(data, dict) else {}
+            retry_after = 0
+            for limiter, key_fn in limiters:
+                key = key_fn(data)
+                if key is None:
+                    continue
+                allowed, retry = limiter.hit(key)
+                if not allowed:
+                    retry_after = max(retry_after, retry)
+            if retry_after:
+                return jsonify({"error": "Too many requests"}), 429, {'Retry-After': str(retry_after)}
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+LOGIN_LIMITS = {
+    'by_ip': os.environ.get('LOGIN_RATE_LIMIT_IP', '20/60'),
+    'by_email': os.environ.get('LOGIN_RATE_LIMIT_EMAIL', '5/60'),
+}
+SIGNUP_LIMITS = {
+    'by_ip': os.environ.get('SIGNUP_RATE_LIMIT_IP', '5/600'),
+}
@@ -0,0 +1,252 @@
+"""
+The API endpoints, registered by create_app() in app.py.
+
+`site` holds the root level routes (sitemap, signup, login, monitoring) and
+`api` everything under /api.
+"""
+import os
+import hmac
+from flask import request, jsonify, current_app, Blueprint
+from flask_jwt_extended import JWTManager, jwt_required, create_access_token, current_user, get_jwt
+from utils import generate_sitemap, fragment_response, join_fragments
+from db_pool import pool_stats
+from pagination import list_response, ids_arg, multi_get_body
+from streaming import wants_stream, stream_response
+from etags import conditional
+from cache import get_fragment, get_backend
+from favorites import (favorites_json, projected_favorites_json, expanded_favorites_json,
+                       add_favorite, remove_favorite, parse_batch, missing_entities, apply_batch)
+from models import db, User, People, Planet, Favorite
+from search import search_args, search_body
+from fields import fields_arg, get_fields, select_fields, encode_fields
+from autocomplete import autocomplete_args, autocomplete_body
+from passwords import hash_password, verify_password, burn_verify, needs_rehash
+from identity import resolve_identity, stats as identity_stats
+from revocation import is_revoked, revoke, stats as revocation_stats
+from ratelimit import rate_limited, LOGIN_LIMITS, SIGNUP_LIMITS
+
+jwt = JWTManager()
+site = Blueprint('site', __name__)
+api = Blueprint('api', __name__)
+
+# Tokens carry the user id as a string subject
+@jwt.user_identity_loader
+def user_identity(user_id):
+    return str(user_id)
+
+# Protected routes see `current_user`, resolved through the identity cache
+@jwt.user_lookup_loader
+def user_lookup(_jwt_header, jwt_data):
+    return resolve_identity(jwt_data['sub'])
+
+# Revoked tokens (POST /logout) are refused with 401
+@jwt.token_in_blocklist_loader
+def token_revoked(_jwt_header, jwt_payload):
+    return is_revoked(jwt_payload)
+
+@jwt.user_lookup_error_loader
+def user_lookup_error(_jwt_header, jwt_data):
+    return jsonify({"error": "User not found or inactive"}), 401
+
+# Hello world test
+@site.route('/')
+def sitemap():
+    return generate_sitemap(current_app)
+
+# Internal monitoring: 404 unless INTERNAL_METRICS_TOKEN is set, then sent as X-Internal-Token
+@site.route('/internal/metrics', methods=['GET'])
+def internal_metrics():
+    token = os.environ.get('INTERNAL_METRICS_TOKEN')
+    if not token:
+        return jsonify({"error": "Not found"}), 404
+    if not hmac.compare_digest(request.headers.get('X-Internal-Token', '').encode('utf-8'), token.encode('utf-8')):
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({
+        "cache": get_backend().stats(),
+        "identities": identity_stats(),
+        "revoked_tokens": revocation_stats(),
+        "db_pool": pool_stats.snapshot(db.engine.pool),
+    }), 200
+
+@site.route('/user', methods=['GET'])
+def handle_hello():
+    return jsonify({"msg": "Hello, this is your GET /user response"}), 200
+
+# Example register user (not required, since you add users via admin)
+@site.route('/signup', methods=['POST'])
+@rate_limited('signup', **SIGNUP_LIMITS)
+def signup():
+    data = request.get_json()
+    email = data.get('email')
+    password = data.get('password')
+    if not email or not password:
+        return jsonify({"error": "Missing email or password"}), 400
+    if not isinstance(email, str) or not isinstance(password, str):
+        return jsonify({"error": "Email and password must be strings"}), 400
+    if User.query.filter_by(email=email).first():
+        return jsonify({"error": "Email already exists"}), 400
+    user = User(email=email, password=hash_password(password), is_active=True)
+    db.session.add(user)
+    db.session.commit()
+    return jsonify({"msg": "User created"}), 201
+
+# Login endpoint to get JWT token
+@site.route('/login', methods=['POST'])
+@rate_limited('login', **LOGIN_LIMITS)
+def login():
+    data = request.get_json()
+    email = data.get('email')
+    password = data.get('password')
+    if not isinstance(email, str) or not isinstance(password, str) or not email or not password:
+        return jsonify({"error": "Invalid credentials"}), 401
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        burn_verify(password)
+        return jsonify({"error": "Invalid credentials"}), 401
+    if not verify_password(user.password, password):
+        return jsonify({"error": "Invalid credentials"}), 401
+    if needs_rehash(user.password):
+        user.password = hash_password(password)
+        db.session.commit()
+    access_token = create_access_token(identity=user.id)
+    return jsonify({"token": access_token}), 200
+
+# Logout endpoint: revoke the token sent with the request
+@site.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    revoke(get_jwt())
+    return jsonify({"msg": "Logged out"}), 200
+
+# GET /people - list people (cursor mode with ?limit=&after=, multi-get with ?ids=)
+@api.route('/people', methods=['GET'])
+@conditional('people')
+def get_people():
+    return list_response(People)
+
+# GET /people/<int:id> - get one person (?fields=name,gender for just those)
+@api.route('/people/<int:people_id>', methods=['GET'])
+@conditional('people')
+def get_person(people_id):
+    fields = fields_arg(People)
+    person = get_fields(People, people_id, fields) if fields else get_fragment(People, people_id)
+    if not person:
+        return jsonify({"error": "Person not found"}), 404
+    return fragment_response(person)
+
+# GET /planets - list planets (cursor mode with ?limit=&after=, multi-get with ?ids=)
+@api.route('/planets', methods=['GET'])
+@conditional('planet')
+def get_planets():
+    return list_response(Planet)
+
+# GET /planets/<int:id> - get one planet (?fields=name,climate for just those)
+@api.route('/planets/<int:planet_id>', methods=['GET'])
+@conditional('planet')
+def get_planet(planet_id):
+    fields = fields_arg(Planet)
+    planet = get_fields(Planet, planet_id, fields) if fields else get_fragment(Planet, planet_id)
+    if not planet:
+        return jsonify({"error": "Planet not found"}), 404
+    return fragment_response(planet)
+
+# GET /batch?people=1,2&planets=3 - resolve people and planets in one call
+@api.route('/batch', methods=['GET'])
+@conditional('people', 'planet')
+def get_batch():
+    body = (b'{"people":' + multi_get_body(People, ids_arg('people'))
+            + b',"planets":' + multi_get_body(Planet, ids_arg('planets')) + b'}')
+    return fragment_response(body)
+
+# GET /search?q=sky&type=people&limit=20 - ranked full-text search over people and planets
+@api.route('/search', methods=['GET'])
+@conditional('people', 'planet')
+def search():
+    return fragment_response(search_body(*search_args()))
+
+# GET /autocomplete?prefix=sky&type=people&limit=10 - type-ahead on people and planet names
+@api.route('/autocomplete', methods=['GET'])
+@conditional('people', 'planet')
+def autocomplete():
+    return fragment_response(autocomplete_body(*autocomplete_args()))
+
+# GET /users - list all users (NDJSON with ?stream=1, only some columns with ?fields=)
+@api.route('/users', methods=['GET'])
+def get_users():
+    fields = fields_arg(User)
+    if wants_stream():
+        return stream_response(User, fields=fields)
+    if fields:
+        users = select_fields(User, fields).order_by(User.id)
+        return fragment_response(join_fragments(encode_fields(users, fields).values()))
+    users = User.query.all()
+    return jsonify([u.serialize() for u in users]), 200
+
+# GET /users/favorites - list current user's favorites (?expand=1 embeds people/planets, ?fields= picks columns)
+@api.route('/users/favorites', methods=['GET'])
+@jwt_required()
+def get_favorites():
+    current_user_id = current_user.id
+    fields = fields_arg(Favorite)
+    if request.args.get('expand', '').lower() in ('1', 'true', 'yes'):
+        return fragment_response(expanded_favorites_json(current_user_id, fields))
+    if fields:
+        return fragment_response(projected_favorites_json(current_user_id, fields))
+    return fragment_response(favorites_json(current_user_id))
+
+# PATCH /users/favorites - add and remove many favorites in one transaction
+@api.route('/users/favorites', methods=['PATCH'])
+@jwt_required()
+def update_favorites():
+    current_user_id = current_user.id
+    batch = parse_batch(request.get_json(silent=True))
+    missing = missing_entities(batch)
+    if missing:
+        return jsonify({"error": "Some favorites do not exist", "missing": missing}), 404
+    return fragment_response(apply_batch(current_user_id, batch))
+
+# POST /favorite/planet/<int:planet_id> - add favorite planet
+@api.route('/favorite/planet/<int:planet_id>', methods=['POST'])
+@jwt_required()
+def add_favorite_planet(planet_id):
+    current_user_id = current_user.id
+    planet = get_fragment(Planet, planet_id)
+    if not planet:
+        return jsonify({"error": "Planet not found"}), 404
+    favorites = add_favorite(current_user_id, planet_id=planet_id)
+    if favorites is None:
+        return jsonify({"msg": "Planet already in favorites"}), 400
+    return fragment_response(favorites)
+
+# POST /favorite/people/<int:people_id> - add favorite person
+@api.route('/favorite/people/<int:people_id>', methods=['POST'])
+@jwt_required()
+def add_favorite_person(people_id):
+    current_user_id = current_user.id
+    person = get_fragment(People, people_id)
+    if not person:
+        return jsonify({"error": "Person not found"}), 404
+    favorites = add_favorite(current_user_id, people_id=people_id)
+    if favorites is None:
+        return jsonify({"msg": "Person already in favorites"}), 400
+    return fragment_response(favorites)
+
+# DELETE /favorite/planet/<int:planet_id> - remove favorite planet
+@api.route('/favorite/planet/<int:planet_id>', methods=['DELETE'])
+@jwt_required()
+def remove_favorite_planet(planet_id):
+    current_user_id = current_user.id
+    favorites = remove_favorite(current_user_id, planet_id=planet_id)
+    if favorites is None:
+        return jsonify({"error": "Favorite planet not found"}), 404
+    return fragment_response(favorites)
+
+# DELETE /favorite/people/<int:people_id> - remove favorite person
+@api.route('/favorite/people/<int:people_id>', methods=['DELETE'])
+@jwt_required()
+def remove_favorite_person(people_id):
+    current_user_id = current_user.id
+    favorites = remove_favorite(current_user_id, people_id=people_id)
+    if favorites is None:
+        return jsonify({"error": "Favorite person not found"}), 404
+    return fragment_response(favorites)
@@ -0,0 +1,150 @@
+"""
+Ranked full-text search over people and planets, for GET /api/search.
+
+Every query word matches as a prefix ("sky" finds "Skywalker"), all words
+must match, and a match on the name ranks above one on climate or terrain.
+
+On Postgres the search runs on the GIN indexes over the weighted tsvector
+expressions below (see the search_indexes migration) and is ranked with
+ts_rank. Elsewhere, i.e. SQLite, each worker keeps an InvertedIndex per
+table, loaded on the first search. Committed changes, local or replayed from
+other workers, mark rows for a re-read before the next search.
+SEARCH_BACKEND=postgres|memory overrides the choice.
+
+Results come back as `{"type", "rank", "item"}`, the item being the cached
+pre-encoded row.
+"""
+import os
+import threading
+from sqlalchemy import select, func, literal_column
+from flask import request
+from cache import get_fragments, dumps
+from events import subscribe
+from inverted_index import InvertedIndex, tokenize
+from models import db, People, Planet
+from utils import APIException, join_fragments
+
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+SEARCH_DEFAULT_LIMIT = int(os.environ.get('SEARCH_DEFAULT_LIMIT', 20))
+SEARCH_MAX_LIMIT = int(os.environ.get('SEARCH_MAX_LIMIT', 100))
+MAX_QUERY_WORDS = 8
+
+TYPES = {'people': People, 'planets': Planet}
+# (column, weight) per table; the weights match ts_rank's defaults for A and B
+FIELDS = {
+    People: [('name', 1.0)],
+    Planet: [('name', 1.0), ('climate', 0.4), ('terrain', 0.4)],
+}
+# Written out so the planner matches the expression indexes exactly
+DOCUMENTS = {
+    People: "setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A')",
+    Planet: ("setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') || "
+             "setweight(to_tsvector('simple'::regconfig, "
+             "coalesce(climate, '') || ' ' || coalesce(terrain, '')), 'B')"),
+}
+
+
+def use_postgres():
+    if SEARCH_BACKEND != 'auto':
+        return SEARCH_BACKEND == 'postgres'
+    return db.engine.dialect.name == 'postgresql'
+
+
+def search_postgres(model, words, limit):
+    document = literal_column('({})'.format(DOCUMENTS[model]))
+    query = func.to_tsquery(literal_column("'simple'::regconfig"), ' & '.join(w + ':*' for w in words))
+    rank = func.ts_rank(document, query).label('rank')
+    stmt = (select(model.id, rank).where(document.op('@@')(query))
+            .order_by(rank.desc(), model.id).limit(limit))
+    return [(float(score), entity_id) for entity_id, score in db.session.execute(stmt)]
+
+
+class TableIndex:
+    """An InvertedIndex over one table, rebuilt per process and patched on change."""
+
+    def __init__(self, model):
+        self.model = model
+        self.index = None
+        self.pid = None
+        self.stale = set()
+        self.lock = threading.Lock()
+
+    def _columns(self):
+        return [getattr(self.model, name) for name, _ in FIELDS[self.model]]
+
+    def _add(self, row):
+        weights = [weight for _, weight in FIELDS[self.model]]
+        self.index.add(row[0], list(zip(row[1:], weights)))
+
+    def refresh(self):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.index = InvertedIndex()
+                self.stale.clear()
+                stmt = select(self.model.id, *self._columns()).execution_options(yield_per=10000)
+                for row in db.session.execute(stmt):
+                    self._add(row)
+                self.pid = os.getpid()
+            elif self.stale:
+                ids, self.stale = self.stale, set()
+                rows = db.session.execute(select(self.model.id, *self._columns())
+                                          .where(self.model.id.in_(ids))).all()
+                for row in rows:
+                    self._add(row)
+                for entity_id in ids - {row[0] for row in rows}:
+                    self.index.remove(entity_id)
+
+    def search(self, words, limit):
+        self.refresh()
+        return self.index.search(words, limit)
+
+
+indexes = {model: TableIndex(model) for model in FIELDS}
+
+
+@subscribe
+def _mark_stale(tablename, ids):
+    for model, table_index in indexes.items():
+        if model.__tablename__ == tablename:
+            with table_index.lock:
+                # Only a loaded index needs patching; on Postgres none is
+                # ever loaded, and a later load reads the table anyway
+                if table_index.pid == os.getpid():
+                    table_index.stale.update(ids)
+
+
+def search_args():
+    words = tokenize(request.args.get('q', ''))[:MAX_QUERY_WORDS]
+    if not words:
+        raise APIException("q must contain at least one word", status_code=400)
+    kind = request.args.get('type')
+    if kind is not None and kind not in TYPES:
+        raise APIException("type must be one of: {}".format(', '.join(TYPES)), status_code=400)
+    try:
+        limit = int(request.args.get('limit', SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        raise APIException("limit must be an integer", status_code=400)
+    if limit < 1 or limit > SEARCH_MAX_LIMIT:
+        raise APIException("limit must be between 1 and {}".format(SEARCH_MAX_LIMIT), status_code=400)
+    return words, [kind] if kind else list(TYPES), limit
+
+
+def search_body(words, kinds, limit):
+    """JSON body of the best `limit` matches across the `kinds` tables."""
+    search = search_postgres if use_postgres() else (lambda model, w, n: indexes[model].search(w, n))
+    hits = []
+    for kind in kinds:
+        hits += [(score, kind, entity_id) for score, entity_id in search(TYPES[kind], words, limit)]
+    hits.sort(key=lambda hit: -hit[0])
+    hits = hits[:limit]
+
+    items = []
+    for kind in kinds:
+        found = [(score, entity_id) for score, k, entity_id in hits if k == kind]
+        fragments = get_fragments(TYPES[kind], [entity_id for _, entity_id in found])
+        for (score, entity_id), fragment in zip(found, fragments):
+            if fragment is not None:
+                items.append((score, b'{"type":' + dumps(kind) + b',"rank":' + dumps(round(score, 6))
+                              + b',"item":' + fragment + b'}'))
+    items.sort(key=lambda item: -item[0])
+    return b'{"results":' + join_fragments(fragment for _, fragment in items) + b'}'
@@ -0,0 +1,42 @@
+"""
+Streaming (NDJSON) responses for clients that need a whole table.
+
+Rows are pulled with `yield_per`, which uses a server-side cursor where the
+driver supports it, and written out one line at a time, so worker memory stays
+flat and the first byte leaves as soon as the first batch is fetched.
+"""
+import os
+from flask import Response, request, current_app, stream_with_context
+from models import db
+from fields import field_columns, project
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_BATCH_SIZE = int(os.environ.get('API_STREAM_BATCH_SIZE', 500))
+
+
+def wants_stream():
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def stream_response(model, listing=None, fields=None):
+    """Every `model` row as NDJSON, filtered and ordered by `listing` if given.
+
+    With `fields` (see fields.py) only those columns are selected.
+    """
+    stmt = db.select(*field_columns(model, fields)) if fields else db.select(model)
+    stmt = listing.apply(stmt) if listing else stmt.order_by(model.id)
+    stmt = stmt.execution_options(yield_per=STREAM_BATCH_SIZE)
+    dumps = current_app.json.dumps
+
+    def generate():
+        if fields:
+            for row in db.session.execute(stmt):
+                yield dumps(project(row, fields)) + "\n"
+        else:
+            for row in db.session.scalars(stmt):
+                yield dumps(row.serialize()) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -1,4 +1,4 @@
-from flask import jsonify, url_for
+from flask import jsonify, url_for, current_app
 
 class APIException(Exception):
     status_code = 400
@@ -15,6 +15,14 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+def join_fragments(fragments):
+    """Assemble a JSON array from already encoded JSON values."""
+    return b"[" + b",".join(f for f in fragments if f is not None) + b"]"
+
+def fragment_response(body, status=200, headers=None):
+    """Send bytes that are already JSON without decoding or re-encoding them."""
+    return current_app.response_class(body, status=status, headers=headers, mimetype='application/json')
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
@@ -27,7 +35,7 @@ def generate_sitemap(app):
         # and rules that require parameters
         if "GET" in rule.methods and has_no_empty_params(rule):
             url = url_for(rule.endpoint, **(rule.defaults or {}))
-            if "/admin/" not in url:
+            if "/admin/" not in url and not url.startswith("/internal/"):
                 links.append(url)
 
     links_html = "".join(["<li><a href='" + y + "'>" + y + "</a></li>" for y in links])